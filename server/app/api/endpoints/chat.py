@@ -1,21 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status, Query
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Callable, Optional, List, Dict
 import logging
 import asyncio
+import json
+import time
 from uuid import UUID, uuid4 
 
-from app.core.dependencies import get_db
-from app.core.security import get_current_user
-from app.models.user import User
-from app.services.ai_service import ollama_service
+from app.core.database import get_async_db
+from app.core.security import get_current_principal
+from app.core.principal_cache import Principal
+from app.core.config import settings
+from app.core.admission import AdmissionRejected, AdmissionTicket
+from app.core import metrics
+from app.core.metrics import RequestTimings, current_timings
+from app.models.enums import ChatMessageStatus
+from app.core.services.prerequisite_graph import prerequisite_graph_index
+from app.services.ai_service import GenerationStats, ollama_service
+from app.services.context_builder import context_builder, message_tokens
+from app.services.course_retrieval import course_retriever
+from app.services.response_cache import (
+    context_fingerprint, is_personal, normalize_prompt, replay_response, response_cache
+)
+from app.services.reply_streams import reply_registry
+from app.services.student_snapshot import student_snapshot_cache
 from app.services.chat_history_service import (
-    create_chat_message,
+    queue_chat_message,
     get_chat_history,
-    get_or_create_session_id
+    get_last_message,
+    get_or_create_session_id,
+    start_ai_reply,
+    reopen_ai_reply,
+    checkpoint_ai_reply,
+    finish_ai_reply
 )
+from app.utils.sse import SSE_HEADERS, sse_event, with_heartbeat
 from fastapi_limiter.depends import RateLimiter 
 
 
@@ -27,6 +50,208 @@ class ChatRequest(BaseModel):
     message: str
     session_id: Optional[UUID] = None 
 
+def _start_timings() -> RequestTimings:
+    timings = RequestTimings()
+    current_timings.set(timings)
+    return timings
+
+def _record_prompt_size(messages: List[Dict[str, str]]) -> None:
+    timings = current_timings.get()
+    prompt_tokens = sum(message_tokens(m) for m in messages)
+    metrics.CHAT_PROMPT_TOKENS.observe(prompt_tokens)
+    if timings is not None:
+        timings.prompt_tokens = prompt_tokens
+
+def _raise_rejected(e: AdmissionRejected):
+    raise HTTPException(
+        status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def _no_snapshot():
+    return None
+
+async def _build_system_prompt(current_user: Principal, query: str, include_snapshot: bool = True):
+    """
+    The advisor system prompt with the student's snapshot and catalog entries
+    relevant to ``query``. Without ``include_snapshot`` the prompt holds nothing
+    from the student's record, so its answer may be shown to other students.
+    """
+    system_message_content = f"""You are an academic advisor AI for Southeastern Louisiana University (SELU) Computer Science department. 
+    You are helping {current_user.first_name or 'a student'} with academic planning and course guidance.
+    Your role is to help with:
+    - Course planning and scheduling advice
+    - Degree requirements and prerequisites  
+    - Academic policies and procedures
+    - Study strategies and academic success tips
+    - General computer science career guidance
+    Be helpful, encouraging, and professional. If you don't know something specific about SELU's current policies or course offerings, 
+    acknowledge this and suggest they contact their human advisor or check the official SELU catalog.
+    Keep responses concise but helpful - aim for 2-3 paragraphs unless more detail is specifically requested."""
+
+    snapshot, catalog_context = await asyncio.gather(
+        run_in_threadpool(student_snapshot_cache.get, current_user.id) if include_snapshot else _no_snapshot(),
+        run_in_threadpool(course_retriever.catalog_context, query),
+        return_exceptions=True,
+    )
+    if isinstance(snapshot, Exception):
+        logger.error(f"Student snapshot failed: {str(snapshot)}")
+        snapshot = None
+    elif snapshot is not None:
+        system_message_content = f"{system_message_content}\n\n{snapshot.text}"
+    if isinstance(catalog_context, Exception):
+        logger.error(f"Course catalog retrieval failed: {str(catalog_context)}")
+    elif catalog_context:
+        system_message_content = f"{system_message_content}\n\n{catalog_context}"
+    return system_message_content, snapshot
+
+async def _stream_ai_reply(
+    user_id: int,
+    session_id: UUID,
+    ticket: Optional[AdmissionTicket],
+    response_generator_factory: Callable[[], AsyncIterator[str]],
+    checkpoint: bool = True,
+    message_id: Optional[int] = None,
+    prefix: str = "",
+    on_complete: Optional[Callable[[str], None]] = None,
+    stats: Optional[GenerationStats] = None,
+):
+    """
+    SSE body for one AI reply, shared by new and continued replies.
+
+    The reply is checkpointed to its ``streaming`` chat message every
+    ``CHAT_CHECKPOINT_INTERVAL`` seconds, so a crash or disconnect loses at most
+    that much text; ``prefix`` is the text an earlier, interrupted attempt
+    already produced.
+
+    Queue wait, time to first token, the gaps between chunks and the total
+    duration are recorded as metrics, and summed up with the request's DB time
+    and Ollama's own ``stats`` in one ``chat_metrics`` log line per reply.
+    """
+    timings = current_timings.get() or RequestTimings()
+    source = "ollama" if stats is not None else "cache"
+    reply = reply_registry.start(user_id, session_id)
+    if prefix:
+        reply.append(prefix)
+    full_ai_response_content = prefix
+    completed = False
+    failed = False
+    checkpoint_task: Optional[asyncio.Task] = None
+    last_checkpoint = time.monotonic()
+    queue_wait = None
+    first_token_at = None
+    last_token_at = None
+    chunk_count = 0
+    yield sse_event(json.dumps({"session_id": str(session_id)}), event="session")
+    try:
+        if ticket is not None:
+            queued_at = time.perf_counter()
+            async for position in ollama_service.admission.wait(ticket):
+                yield sse_event(json.dumps({"position": position}), event="queue")
+            queue_wait = time.perf_counter() - queued_at
+            metrics.CHAT_QUEUE_WAIT_SECONDS.observe(queue_wait)
+        if checkpoint and message_id is None:
+            try:
+                message_id = await start_ai_reply(user_id, session_id)
+            except Exception as e:
+                logger.error(f"Could not start reply checkpointing, saving at the end instead: {str(e)}")
+        elif checkpoint:
+            try:
+                await reopen_ai_reply(message_id)
+            except Exception as e:
+                logger.error(f"Could not reopen reply {message_id}, saving at the end instead: {str(e)}")
+
+        async for chunk in response_generator_factory():
+            if chunk.startswith("ERROR:"): 
+                logger.error(f"AI service error during stream: {chunk}")
+                yield sse_event(chunk[len("ERROR:"):].strip(), event="error")
+                failed = True
+                break
+            now = time.perf_counter()
+            if first_token_at is None:
+                first_token_at = now
+                metrics.CHAT_FIRST_TOKEN_SECONDS.observe(now - timings.started, source=source)
+            else:
+                metrics.CHAT_INTER_TOKEN_SECONDS.observe(now - last_token_at)
+            last_token_at = now
+            chunk_count += 1
+            full_ai_response_content += chunk
+            reply.append(chunk)
+            yield sse_event(chunk, id=str(len(full_ai_response_content)))
+
+            if (
+                message_id is not None
+                and time.monotonic() - last_checkpoint >= settings.CHAT_CHECKPOINT_INTERVAL
+                and (checkpoint_task is None or checkpoint_task.done())
+            ):
+                # Written in the background so tokens keep flowing; a checkpoint
+                # landing after the final write is ignored by its status guard.
+                checkpoint_task = asyncio.create_task(
+                    checkpoint_ai_reply(message_id, full_ai_response_content)
+                )
+                last_checkpoint = time.monotonic()
+        else:
+            completed = True
+        
+    except Exception as e:
+        logger.error(f"Error during AI streaming or response accumulation: {str(e)}")
+        failed = True
+        yield sse_event(f"An unexpected error occurred: {str(e)}", event="error")
+    finally:
+        # Also reached when the client disconnects and the stream is
+        # cancelled: the upstream generation is abandoned and whatever was
+        # produced so far is kept for a resume or a continue.
+        reply_registry.finish(reply, aborted=not completed)
+        if ticket is not None:
+            ollama_service.admission.release(ticket)
+        if completed and on_complete is not None and full_ai_response_content:
+            on_complete(full_ai_response_content)
+        if message_id is not None:
+            await finish_ai_reply(
+                user_id, session_id, message_id, full_ai_response_content,
+                ChatMessageStatus.COMPLETE if completed else ChatMessageStatus.ABORTED,
+                continued=bool(prefix),
+            )
+            logger.info(f"AI response saved for user {user_id}, session {session_id}")
+        elif full_ai_response_content:
+            await queue_chat_message(user_id, session_id, "ai", full_ai_response_content)
+            logger.info(f"AI response queued for user {user_id}, session {session_id}")
+
+        outcome = "complete" if completed else ("error" if failed else "aborted")
+        duration = time.perf_counter() - timings.started
+        metrics.CHAT_REQUEST_SECONDS.observe(duration, outcome=outcome)
+        summary = {
+            "session_id": str(session_id),
+            "user_id": user_id,
+            "source": source,
+            "outcome": outcome,
+            "duration": round(duration, 4),
+            "queue_wait": round(queue_wait, 4) if queue_wait is not None else None,
+            "db_time": round(timings.db_seconds, 4),
+            "ttft": round(first_token_at - timings.started, 4) if first_token_at is not None else None,
+            "chunks": chunk_count,
+            "prompt_tokens_estimate": timings.prompt_tokens,
+        }
+        if stats is not None and stats.eval_count is not None:
+            summary["ollama"] = {
+                key: round(value, 4) if isinstance(value, float) else value
+                for key, value in stats.as_dict().items()
+            }
+        logger.info(f"chat_metrics {json.dumps(summary)}")
+    yield sse_event(
+        json.dumps({"session_id": str(session_id), "length": len(full_ai_response_content), "complete": completed}),
+        event="done",
+    )
+
+def _sse_response(events, request: Request, ticket: Optional[AdmissionTicket] = None) -> StreamingResponse:
+    # The generator's finally never runs if the client is gone before streaming
+    # starts; releasing the ticket again afterwards is a no-op otherwise.
+    return StreamingResponse(
+        with_heartbeat(events, settings.SSE_HEARTBEAT_INTERVAL, request),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(ollama_service.admission.release, ticket) if ticket else None,
+    )
+
 @chat_router.post(
     "/", 
     response_class=StreamingResponse,
@@ -34,90 +259,286 @@ class ChatRequest(BaseModel):
 )
 async def chat_with_ai(
     chat_request: ChatRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Main chat endpoint for AI academic advisor, now with streaming and history.
+
+    The reply is a Server-Sent Events stream: a ``session`` event first, then
+    ``queue`` events while waiting for a generation slot, the reply text as
+    ``message`` events whose id is the character offset reached, and finally
+    ``error`` and/or ``done``. Comment lines are sent as heartbeats.
     """
-    if not await ollama_service.health_check(): 
+    _start_timings()
+    if not ollama_service.is_available():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="AI service is currently unavailable. Please try again later."
         )
-    
     current_session_id = await get_or_create_session_id(
         db, current_user.id, chat_request.session_id
     )
 
-    await create_chat_message( 
-        db, current_user.id, current_session_id, "user", chat_request.message
+    # The new message is only queued for saving once the request is admitted,
+    # so a refused request leaves nothing behind.
+    history_messages = await get_chat_history(
+        db, current_user.id, current_session_id, limit=settings.CHAT_HISTORY_LIMIT
+    )
+    history_messages = history_messages[-(settings.CHAT_HISTORY_LIMIT - 1):] + [
+        {"role": "user", "content": chat_request.message}
+    ]
+    # Only opening questions are cached: a follow-up's answer depends on the
+    # conversation so far. An impersonal opening question is answered without
+    # the student's snapshot, so its answer can be shared with every student of
+    # the same first name; a personal one is cached for its asker only.
+    opening = len(history_messages) == 1
+    shared = opening and not is_personal(chat_request.message)
+    system_message_content, snapshot = await _build_system_prompt(
+        current_user, chat_request.message, include_snapshot=not shared
     )
 
-    history_messages = await get_chat_history(
-        db, current_user.id, current_session_id, limit=50
+    messages: List[Dict[str, str]] = context_builder.build(
+        system_message_content, history_messages, current_session_id
     )
+    _record_prompt_size(messages)
+    user_id = current_user.id
 
-    system_message_content = f"""You are an academic advisor AI for Southeastern Louisiana University (SELU) Computer Science department. 
-    You are helping {current_user.first_name or 'a student'} with academic planning and course guidance.
-    Your role is to help with:
-    - Course planning and scheduling advice
-    - Degree requirements and prerequisites  
-    - Academic policies and procedures
-    - Study strategies and academic success tips
-    - General computer science career guidance
-    Be helpful, encouraging, and professional. If you don't know something specific about SELU's current policies or course offerings, 
-    acknowledge this and suggest they contact their human advisor or check the official SELU catalog.
-    Keep responses concise but helpful - aim for 2-3 paragraphs unless more detail is specifically requested."""
-    
-    messages: List[Dict[str, str]] = [
-        {"role": "system", "content": system_message_content},
-    ]
-    messages.extend(history_messages)
-    async def stream_and_save_response():
-        full_ai_response_content = ""
+    cache_context = None
+    if shared:
+        cache_context = context_fingerprint(
+            prerequisite_graph_index.version, "shared", current_user.first_name
+        )
+    elif opening and snapshot is not None:
+        cache_context = context_fingerprint(
+            prerequisite_graph_index.version, user_id, snapshot.digest, current_user.first_name
+        )
+    cached_response = (
+        response_cache.get(cache_context, chat_request.message) if cache_context else None
+    )
+
+    if cached_response is not None:
+        await queue_chat_message(user_id, current_session_id, "user", chat_request.message)
+        events = _stream_ai_reply(
+            user_id, current_session_id, None,
+            lambda: replay_response(cached_response, settings.RESPONSE_CACHE_REPLAY_DELAY),
+            checkpoint=False,
+        )
+        return _sse_response(events, request)
+
+    # Shared opening questions in flight at the same time join one generation
+    # even when worded slightly differently; their prompt holds no student's
+    # record. Anything else only joins a generation of the exact same payload.
+    coalesce_key = (
+        context_fingerprint(cache_context, normalize_prompt(chat_request.message)) if shared else None
+    )
+    generation_key = ollama_service.generation_key(messages, coalesce_key)
+
+    # Joining a running generation costs Ollama nothing, so it needs no slot
+    # and is never refused; otherwise a burst of one question would be
+    # regenerated once per slot.
+    ticket = None
+    if not ollama_service.is_generating(generation_key):
         try:
-            response_generator = ollama_service.chat_stream(
-                messages=messages
-            )
-            
-            async for chunk in response_generator:
-                if chunk.startswith("ERROR:"): 
-                    logger.error(f"AI service error during stream: {chunk}")
-                    yield f"AI_ERROR: {chunk}"
-                    break
-                full_ai_response_content += chunk
+            ticket = ollama_service.admission.enqueue(user_id)
+        except AdmissionRejected as e:
+            _raise_rejected(e)
+
+    await queue_chat_message(user_id, current_session_id, "user", chat_request.message)
+
+    def remember(response: str) -> None:
+        if cache_context:
+            response_cache.put(cache_context, chat_request.message, response)
+
+    stats = GenerationStats()
+
+    def stream() -> AsyncIterator[str]:
+        return ollama_service.chat_stream(
+            messages=messages,
+            coalesce_key=coalesce_key,
+            affinity_key=str(current_session_id),
+            stats=stats,
+        )
+
+    async def stream_after_admission() -> AsyncIterator[str]:
+        # The generation this request meant to join ended before it
+        # subscribed, so it has to wait for a slot of its own after all.
+        try:
+            late_ticket = ollama_service.admission.enqueue(user_id)
+        except AdmissionRejected as e:
+            yield f"ERROR: {e.detail}"
+            return
+        try:
+            async for _ in ollama_service.admission.wait(late_ticket):
+                pass
+            async for chunk in stream():
                 yield chunk
-            
-        except Exception as e:
-            logger.error(f"Error during AI streaming or response accumulation: {str(e)}")
-            yield f"AI_ERROR: An unexpected error occurred: {str(e)}"
         finally:
-            if full_ai_response_content:
-                try:
-                    await create_chat_message(
-                        db, current_user.id, current_session_id, "ai", full_ai_response_content
-                    )
-                    logger.info(f"AI response saved for user {current_user.id}, session {current_session_id}")
-                except Exception as db_e:
-                    logger.error(f"Failed to save AI response to DB: {db_e}")
+            ollama_service.admission.release(late_ticket)
+
+    def generate() -> AsyncIterator[str]:
+        # Called once the slot is granted. Meanwhile an identical request may
+        # have finished into the cache or started a generation; either way the
+        # slot is handed straight back.
+        cached = response_cache.get(cache_context, chat_request.message) if cache_context else None
+        if cached is not None:
+            if ticket is not None:
+                ollama_service.admission.release(ticket)
+            return replay_response(cached, settings.RESPONSE_CACHE_REPLAY_DELAY)
+        if ollama_service.is_generating(generation_key):
+            if ticket is not None:
+                ollama_service.admission.release(ticket)
+            return stream()
+        if ticket is None:
+            return stream_after_admission()
+        return stream()
+
+    events = _stream_ai_reply(
+        user_id, current_session_id, ticket, generate,
+        on_complete=remember,
+        stats=stats,
+    )
+    return _sse_response(events, request, ticket)
+
+@chat_router.post(
+    "/sessions/{session_id}/continue",
+    response_class=StreamingResponse,
+    dependencies=[Depends(RateLimiter(times=5, seconds=60))]
+)
+async def continue_chat_reply(
+    session_id: UUID,
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Continue an AI reply that was cut off, starting from its last checkpoint.
+
+    The saved text is sent back to the model as the start of its answer, and the
+    stream's event ids continue from the saved text's length, so a client can
+    append the new ``message`` events to what it already shows.
+    """
+    _start_timings()
+    live = reply_registry.get(current_user.id, session_id)
+    if live is not None and not live.done:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This reply is still being generated; resume the stream instead."
+        )
+    last_message = await get_last_message(db, current_user.id, session_id)
+    if (
+        last_message is None
+        or last_message.role != "ai"
+        or last_message.id is None
+        or last_message.status == ChatMessageStatus.COMPLETE.value
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="There is no interrupted reply to continue."
+        )
+    if not ollama_service.is_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is currently unavailable. Please try again later."
+        )
+    try:
+        ticket = ollama_service.admission.enqueue(current_user.id)
+    except AdmissionRejected as e:
+        _raise_rejected(e)
+
+    history_messages = await get_chat_history(
+        db, current_user.id, session_id, limit=settings.CHAT_HISTORY_LIMIT
+    )
+    # The interrupted reply is the newest message and already in the history;
+    # it is sent once, as the assistant turn to continue, below.
+    if history_messages and history_messages[-1]["role"] == "ai":
+        history_messages = history_messages[:-1]
+    query = next((m["content"] for m in reversed(history_messages) if m["role"] == "user"), "")
+    system_message_content, _ = await _build_system_prompt(current_user, query)
+    messages = context_builder.build(system_message_content, history_messages, session_id)
+    # Ending on an assistant turn makes Ollama carry on from the saved text.
+    messages.append({"role": "assistant", "content": last_message.content})
+    _record_prompt_size(messages)
+
+    stats = GenerationStats()
+    events = _stream_ai_reply(
+        current_user.id, session_id, ticket,
+        lambda: ollama_service.chat_stream(messages=messages, affinity_key=str(session_id), stats=stats),
+        message_id=last_message.id,
+        prefix=last_message.content,
+        stats=stats,
+    )
+    return _sse_response(events, request, ticket)
+
+@chat_router.get("/sessions/{session_id}/stream", response_class=StreamingResponse)
+async def resume_chat_stream(
+    session_id: UUID,
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    offset: Optional[int] = Query(None, ge=0, description="Used when the Last-Event-ID header can't be sent"),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Resume the latest AI reply of a session from the Last-Event-ID offset.
+
+    A reply still being generated in this process is followed live; otherwise
+    the rest of the stored reply (or of its last checkpoint) is sent. Either way
+    the stream ends with ``done``, whose ``complete`` flag tells the client
+    whether to call ``/continue``.
+    """
+    if last_event_id is not None:
+        try:
+            offset = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+    offset = offset or 0
+
+    live = reply_registry.get(current_user.id, session_id)
+    stored_reply = ""
+    stored_complete = True
+    if live is None:
+        last_message = await get_last_message(db, current_user.id, session_id)
+        if last_message is not None and last_message.role == "ai":
+            stored_reply = last_message.content
+            stored_complete = last_message.status == ChatMessageStatus.COMPLETE.value
+
+    async def resume():
+        length = offset
+        complete = stored_complete
+        if live is not None:
+            async for end, chunk in live.follow(offset):
+                length = end
+                yield sse_event(chunk, id=str(end))
+            complete = not live.aborted
+        elif len(stored_reply) > offset:
+            length = len(stored_reply)
+            yield sse_event(stored_reply[offset:], id=str(length))
+        yield sse_event(
+            json.dumps({"session_id": str(session_id), "length": length, "complete": complete}),
+            event="done",
+        )
 
-    return StreamingResponse(stream_and_save_response(), media_type="text/event-stream")
+    return _sse_response(resume(), request)
 
 @chat_router.get("/health")
 async def chat_health():
-    """Check if AI service is available"""
-    is_healthy = await ollama_service.health_check() 
+    """Report the AI service state cached by the background health prober"""
+    status_info = ollama_service.health_status()
+    is_healthy = bool(status_info["healthy"])
     return {
         "status": "healthy" if is_healthy else "unhealthy",
         "service": "ollama",
         "model": ollama_service.model if is_healthy else None, 
-        "message": "AI service is ready" if is_healthy else "AI service is not available"
+        "message": "AI service is ready" if is_healthy else "AI service is not available",
+        "circuit": status_info["circuit"],
+        "last_probe_at": status_info["last_probe_at"],
+        "backends": status_info["backends"],
     }
 
 @chat_router.get("/test")
 async def test_ai_response(
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Test endpoint for AI functionality (remove in production)"""
     test_message_parts = []
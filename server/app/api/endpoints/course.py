@@ -6,9 +6,13 @@ from app.core.dependencies import get_db
 from app.models.student_course import StudentCourse
 from app.models.course import Course as CourseModel
 from app.models.enums import CourseCategory, CourseLevel
-from app.schemas.course import CourseCreate, CourseUpdate, CourseRead, CourseRecommendation
-from app.core.security import get_current_user
-from app.models.user import User
+from app.schemas.course import (
+    CourseCreate, CourseUpdate, CourseRead, CourseRecommendation,
+    BulkRecommendationRequest, StudentRecommendations,
+)
+from app.core.security import get_current_principal
+from app.core.principal_cache import Principal
+from app.models.user import User, UserRole
 from app.core.services.recommendation_service import RecommendationService
 
 course_module = APIRouter(prefix="/courses", tags=["courses"]) 
@@ -52,7 +56,7 @@ def search_courses(q: str, db: Session = Depends(get_db)):
 @course_module.get("/recommendations", response_model=list[CourseRecommendation])
 def get_recommendations(
     limit: int = Query(5, ge=1, le=10),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -61,6 +65,40 @@ def get_recommendations(
     recommendation_service = RecommendationService(db)
     return recommendation_service.get_course_recommendations(current_user.id, limit)
 
+@course_module.post("/recommendations/bulk", response_model=list[StudentRecommendations])
+def get_bulk_recommendations(
+    payload: BulkRecommendationRequest,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """
+    Get course recommendations for several students in one call.
+    Advisors may only request their own advisees; admins may request anyone.
+    """
+    user_ids = list(dict.fromkeys(payload.user_ids))
+
+    if current_user.role == UserRole.ADVISOR:
+        advisee_ids = {
+            user_id for (user_id,) in db.query(User.id).filter(
+                User.advisor_id == current_user.id,
+                User.id.in_(user_ids)
+            )
+        }
+        if len(advisee_ids) != len(user_ids):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Recommendations can only be requested for your advisees",
+            )
+    elif current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operation not permitted")
+
+    recommendation_service = RecommendationService(db)
+    recommendations = recommendation_service.get_bulk_course_recommendations(user_ids, payload.limit)
+    return [
+        StudentRecommendations(user_id=user_id, recommendations=recommendations[user_id])
+        for user_id in user_ids
+    ]
+
 @course_module.get("/{course_id}", response_model=CourseRead)
 def get_course(course_id: int, db: Session = Depends(get_db)):
     course = db.get(CourseModel, course_id)
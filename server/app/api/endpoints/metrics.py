@@ -0,0 +1,87 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.passwords import password_hasher
+from app.services.ai_service import ollama_service
+from app.services.chat_persistence_queue import chat_persistence_queue
+
+metrics_module = APIRouter(tags=["metrics"])
+
+GENERATIONS_ACTIVE = metrics.registry.gauge(
+    "ollama_generations_active", "Generations currently holding an Ollama slot."
+)
+GENERATIONS_QUEUED = metrics.registry.gauge(
+    "ollama_generations_queued", "Chat requests waiting for an Ollama slot."
+)
+BACKEND_OUTSTANDING = metrics.registry.gauge(
+    "ollama_backend_outstanding", "Generations in flight per Ollama backend.", ["backend"]
+)
+BACKEND_LATENCY = metrics.registry.gauge(
+    "ollama_backend_first_token_seconds", "Smoothed time to first token per Ollama backend.", ["backend"]
+)
+CHAT_MESSAGES_PENDING = metrics.registry.gauge(
+    "chat_messages_pending", "Chat messages waiting in the write-behind queue."
+)
+PASSWORD_HASH_PENDING = metrics.registry.gauge(
+    "password_hash_pending", "bcrypt operations queued or running."
+)
+PASSWORD_HASH_ACTIVE = metrics.registry.gauge(
+    "password_hash_active", "bcrypt operations running."
+)
+
+
+def _collect_ollama_state() -> None:
+    GENERATIONS_ACTIVE.set(ollama_service.admission.active)
+    GENERATIONS_QUEUED.set(ollama_service.admission.queued)
+    for backend in ollama_service.pool.backends:
+        BACKEND_OUTSTANDING.set(backend.outstanding, backend=backend.base_url)
+        if backend.latency is not None:
+            BACKEND_LATENCY.set(backend.latency, backend=backend.base_url)
+
+
+def _collect_chat_persistence_state() -> None:
+    CHAT_MESSAGES_PENDING.set(chat_persistence_queue.depth)
+
+
+def _collect_password_hasher_state() -> None:
+    PASSWORD_HASH_PENDING.set(password_hasher.pending)
+    PASSWORD_HASH_ACTIVE.set(password_hasher.active)
+
+
+metrics.registry.add_collector(_collect_ollama_state)
+metrics.registry.add_collector(_collect_chat_persistence_state)
+metrics.registry.add_collector(_collect_password_hasher_state)
+
+
+def require_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+) -> None:
+    # Labels name internal hosts such as the Ollama backends, so the endpoint
+    # doesn't exist until a scrape token is configured.
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(
+        credentials.credentials.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@metrics_module.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+    dependencies=[Depends(require_metrics_token)],
+)
+async def prometheus_metrics():
+    """Chat pipeline metrics in the Prometheus text exposition format; scrape with the METRICS_TOKEN bearer token"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
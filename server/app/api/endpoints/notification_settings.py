@@ -5,8 +5,8 @@ from sqlalchemy.orm import Session
 from typing import Dict, Any
 
 from app.core.dependencies import get_db
-from app.core.security import get_current_user
-from app.models.user import User as UserModel
+from app.core.security import get_current_principal
+from app.core.principal_cache import Principal
 from app.schemas.notification_settings import (
     NotificationSettingsResponse, 
     NotificationSettingsUpdate
@@ -21,7 +21,7 @@ notification_module = APIRouter(tags=["notifications settings"])
 
 @notification_module.get("/users/me/notification-settings", response_model=NotificationSettingsResponse)
 def get_notification_settings(
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ) -> NotificationSettingsResponse:
     """
@@ -43,7 +43,7 @@ def get_notification_settings(
 @notification_module.put("/users/me/notification-settings", response_model=NotificationSettingsResponse)
 def update_notification_settings(
     settings_update: NotificationSettingsUpdate,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ) -> NotificationSettingsResponse:
     """
@@ -67,7 +67,7 @@ def update_notification_settings(
 
 @notification_module.get("/users/me/notification-settings/check")
 def check_notification_allowed(
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
@@ -5,7 +5,8 @@ from sqlalchemy import func
 from datetime import datetime
 
 from app.core.dependencies import get_db
-from app.core.security import get_current_user
+from app.core.security import get_current_principal, get_current_user
+from app.core.principal_cache import Principal
 from app.models.user import User
 from app.models.student_course import StudentCourse
 from app.models.course import Course as CourseModel
@@ -39,7 +40,7 @@ def get_progress(current_user: User = Depends(get_current_user), db: Session = D
 @progress_module.post("/", status_code=status.HTTP_201_CREATED)
 def add_course_progress(
     course_data: ProgressCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     record = StudentCourse(
@@ -57,7 +58,7 @@ def add_course_progress(
 def update_course_progress(
     course_id: int,
     update_data: ProgressUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     record = db.query(StudentCourse).filter(
@@ -75,7 +76,7 @@ def update_course_progress(
 @progress_module.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
 def remove_course_progress(
     course_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     record = db.query(StudentCourse).filter(
@@ -5,8 +5,8 @@ from app.core.dependencies import get_db
 from app.schemas.student_course import StudentCourseCreate, StudentCourseRead
 from app.models.student_course import StudentCourse
 from app.models.course import Course
-from app.core.security import get_current_user
-from app.models.user import User
+from app.core.security import get_current_principal
+from app.core.principal_cache import Principal
 from . import functions
 
 student_course_module = APIRouter(prefix="/student-courses", tags=["student-courses"])
@@ -15,7 +15,7 @@ student_course_module = APIRouter(prefix="/student-courses", tags=["student-cour
 @student_course_module.post("/", response_model=StudentCourseRead, status_code=201)
 def assign_course(
     payload: StudentCourseCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     return functions.assign_course_to_student(db, current_user.id, payload)
@@ -40,7 +40,7 @@ def get_by_course(course_id: int, db: Session = Depends(get_db)):
 def update_student_course(
     course_id: int,
     payload: StudentCourseCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     return functions.update_student_course(db, current_user.id, course_id, payload)
@@ -49,7 +49,7 @@ def update_student_course(
 @student_course_module.delete("/{course_id}")
 def delete_student_course(
     course_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     return functions.delete_student_course(db, current_user.id, course_id)
@@ -1,23 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from typing import Annotated, List
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
 
 from app.schemas.user import User, UserLogin, Token
+from app.core.auth import hash_refresh_token
 from app.core.dependencies import get_db, get_current_user
+from app.core.passwords import PasswordHasherBusy
 from app.core.settings import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
 from app.api.endpoints.user import functions as user_functions
 from app.models.user import User as UserModel
 from app.models.user_session import UserSession
 from app.schemas.session import SessionInfo, SessionList
 from app.schemas.degree_program import DegreeProgramBase
+from app.services.session_activity import session_activity
 
 auth_module = APIRouter()
 
 @auth_module.post("/login", response_model=Token)
 async def login_for_access_token(user: UserLogin, request: Request, db: Session = Depends(get_db)) -> Token:
-    db_user = user_functions.authenticate_user(db, user=user)
+    try:
+        db_user = await user_functions.authenticate_user(db, user=user)
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,7 +42,7 @@ async def login_for_access_token(user: UserLogin, request: Request, db: Session
     )
     
     refresh_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token = await user_functions.create_refresh_token(
+    refresh_token = user_functions.create_refresh_token(
         data={"id": db_user.id, "email": db_user.email, "role": db_user.role.value},
         expires_delta=refresh_expires,
     )
@@ -44,6 +54,8 @@ async def login_for_access_token(user: UserLogin, request: Request, db: Session
     session = UserSession(
         user_id=db_user.id,
         refresh_token=refresh_token,
+        refresh_token_hash=hash_refresh_token(refresh_token),
+        expires_at=datetime.now(timezone.utc) + refresh_expires,
         device_info=user_agent,
         ip_address=ip_address
     )
@@ -54,18 +66,26 @@ async def login_for_access_token(user: UserLogin, request: Request, db: Session
 
 @auth_module.post("/refresh", response_model=Token)
 async def refresh_access_token(refresh_token: str, request: Request, db: Session = Depends(get_db)) -> Token:
-    token_data = await user_functions.refresh_access_token(db, refresh_token)
-    
-    # Update session last activity
+    # A session deactivated by sign-out or by the sweeper can't be refreshed.
     session = db.query(UserSession).filter(
-        UserSession.refresh_token == refresh_token,
-        UserSession.is_active == True
+        UserSession.refresh_token_hash == hash_refresh_token(refresh_token),
+        UserSession.is_active == True,
+        or_(UserSession.expires_at.is_(None), UserSession.expires_at > datetime.now(timezone.utc))
     ).first()
-    
-    if session:
-        session.last_activity = func.now()
-        db.commit()
-    
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired or revoked",
+        )
+
+    token_data = await user_functions.refresh_access_token(db, refresh_token)
+
+    # The session follows the rotated token, so it can be refreshed again.
+    session.refresh_token_hash = hash_refresh_token(token_data["refresh_token"])
+    db.commit()
+    # Last activity is written in batches by the tracker, not per request.
+    session_activity.touch(session.id)
+
     return Token(**token_data)
 
 @auth_module.get("/me")
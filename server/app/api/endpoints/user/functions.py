@@ -1,22 +1,17 @@
-from fastapi import HTTPException, status, Depends
-from typing import Annotated, Optional
-from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
+from fastapi import HTTPException, status
+from typing import Optional
+from datetime import timedelta
 from sqlalchemy.orm import Session
-from fastapi.security import OAuth2PasswordBearer
 
 # from auth import models, schemas
-from jose import JWTError, jwt
+from jose import JWTError
 
 # import 
 from app.models import user as UserModel
 from app.schemas.user import User, UserCreate, UserUpdate, Token, UserLogin
-from app.core.settings import SECRET_KEY, REFRESH_SECRET_KEY, ALGORITHM
+from app.core.auth import create_access_token, create_refresh_token, decode_refresh_token
+from app.core.passwords import password_hasher, pwd_context
 from app.core.settings import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
-from app.core.dependencies import get_db, oauth2_scheme
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt"""
@@ -39,7 +34,7 @@ def get_user_by_id(db: Session, user_id: int):
 
 # crete new user 
 def create_new_user(db: Session, user: UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = password_hasher.hash_blocking(user.password)
     new_user = UserModel.User(
         w_number=user.w_number,
         email=user.email, 
@@ -82,37 +77,27 @@ def get_user_by_w_number(db: Session, w_number: str):
     return db.query(User).filter(User.w_number == w_number).first()
 
 # =====================> login/logout <============================
-def authenticate_user(db: Session, user: UserLogin) -> Optional[UserModel.User]:
+async def authenticate_user(db: Session, user: UserLogin) -> Optional[UserModel.User]:
+    """
+    Check the credentials on the password hashing pool.
+
+    A password stored at an outdated bcrypt cost is rehashed on the spot; the
+    new hash is saved with the caller's next commit. Raises
+    ``PasswordHasherBusy`` when the pool is saturated.
+    """
     db_user = get_user_by_email(db, user.email)
     if not db_user:
         return None
-    if not verify_password(user.password, db_user.password):
+    valid, new_hash = await password_hasher.verify_and_update(user.password, db_user.password)
+    if not valid:
         return None
+    if new_hash:
+        db_user.password = new_hash
     return db_user
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-async def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 async def refresh_access_token(db: Session, refresh_token: str):
     try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_refresh_token(refresh_token)
         user_id: int = payload.get("id")
         if user_id is None:
             raise HTTPException(
@@ -120,7 +105,7 @@ async def refresh_access_token(db: Session, refresh_token: str):
                 detail="Invalid refresh token",
             )
         
-        user = db.query(UserModel.User).filter(UserModel.User.id == user_id).first()
+        user = db.get(UserModel.User, user_id)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -134,7 +119,7 @@ async def refresh_access_token(db: Session, refresh_token: str):
         )
         
         refresh_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-        refresh_token = await create_refresh_token(
+        refresh_token = create_refresh_token(
             data={"id": user.id, "email": user.email, "role": user.role.value},
             expires_delta=refresh_expires,
         )
@@ -149,26 +134,3 @@ async def refresh_access_token(db: Session, refresh_token: str):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
         )
-
-# get current users info 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> UserModel.User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("id")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(UserModel.User).filter(UserModel.User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
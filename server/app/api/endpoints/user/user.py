@@ -5,7 +5,8 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.core.dependencies import get_db
-from app.core.security import get_current_user, get_password_hash
+from app.core.security import get_current_user
+from app.core.passwords import PasswordHasherBusy, password_hasher
 from app.models.user import User as UserModel, UserRole, AcademicYear
 from app.schemas.user import User, UserCreate, UserUpdate
 from app.schemas.user_profile import UserProfileDetailedResponse
@@ -38,10 +39,19 @@ def create_new_user(payload: UserCreate, db: Session = Depends(get_db)):
     if db.query(UserModel).filter(UserModel.w_number == w_num).first():
         raise HTTPException(409, "W-number already exists")
 
+    try:
+        hashed_password = password_hasher.hash_blocking(payload.password)
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ups right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
     user = UserModel(
         w_number=w_num,
         email=payload.email,
-        password=get_password_hash(payload.password),
+        password=hashed_password,
         first_name=payload.first_name,
         last_name=payload.last_name,
         current_degree_program_id=payload.current_degree_program_id,
@@ -0,0 +1,148 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Hashable, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't even be queued; carries the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    __slots__ = ("owner", "granted", "released", "wakeup")
+
+    def __init__(self, owner: Hashable):
+        self.owner = owner
+        self.granted = False
+        self.released = False
+        self.wakeup = asyncio.Event()
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a per-owner fair queue in front of a scarce backend.
+
+    At most ``max_concurrent`` tickets hold a slot at once. Waiting tickets are
+    grouped per owner and granted round-robin across owners, so one student
+    firing several prompts can't starve everybody else. ``enqueue`` refuses
+    work up front, rather than letting it time out later, once
+    ``max_queue_depth`` tickets are waiting (503) or the owner already has
+    ``max_per_owner`` tickets waiting (429).
+    """
+
+    def __init__(self, max_concurrent: int, max_queue_depth: int, max_per_owner: int, retry_after: int = 10):
+        self.max_concurrent = max_concurrent
+        self.max_queue_depth = max_queue_depth
+        self.max_per_owner = max_per_owner
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self._queues: "OrderedDict[Hashable, Deque[AdmissionTicket]]" = OrderedDict()
+
+    def check(self, owner: Hashable) -> None:
+        """Raise ``AdmissionRejected`` if ``enqueue(owner)`` would be refused right now."""
+        if self.active < self.max_concurrent and not self.queued:
+            return
+        owner_queue = self._queues.get(owner)
+        if owner_queue is not None and len(owner_queue) >= self.max_per_owner:
+            raise AdmissionRejected(
+                429, "You already have requests waiting. Please wait for them to finish.", self.retry_after
+            )
+        if self.queued >= self.max_queue_depth:
+            raise AdmissionRejected(
+                503, "The AI advisor is at capacity. Please try again shortly.", self.retry_after
+            )
+
+    def enqueue(self, owner: Hashable) -> AdmissionTicket:
+        """Take a slot now if one is free, otherwise join the owner's queue."""
+        ticket = AdmissionTicket(owner)
+        if self.active < self.max_concurrent and not self.queued:
+            self._grant(ticket)
+            return ticket
+
+        self.check(owner)
+        owner_queue = self._queues.get(owner)
+        if owner_queue is None:
+            owner_queue = self._queues[owner] = deque()
+        owner_queue.append(ticket)
+        self.queued += 1
+        return ticket
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        """1-based place in line under round-robin service; 0 once the ticket holds a slot."""
+        if ticket.granted:
+            return 0
+        owner_queue = self._queues.get(ticket.owner)
+        if owner_queue is None or ticket not in owner_queue:
+            return 0
+        depth = owner_queue.index(ticket)
+        ahead = depth
+        seen_owner = False
+        for owner, tickets in self._queues.items():
+            if owner == ticket.owner:
+                seen_owner = True
+            elif seen_owner:
+                ahead += min(len(tickets), depth)
+            else:
+                # Owners earlier in the rotation are served first within a round.
+                ahead += min(len(tickets), depth + 1)
+        return ahead + 1
+
+    async def wait(self, ticket: AdmissionTicket) -> AsyncIterator[int]:
+        """Yield the ticket's queue position each time it changes until a slot is granted."""
+        last = None
+        while not ticket.granted:
+            position = self.position(ticket)
+            if position != last:
+                last = position
+                yield position
+            await ticket.wakeup.wait()
+            ticket.wakeup.clear()
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        """Give back the slot, or leave the queue if still waiting. Safe to call more than once."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self.active -= 1
+        else:
+            owner_queue = self._queues.get(ticket.owner)
+            if owner_queue is not None and ticket in owner_queue:
+                owner_queue.remove(ticket)
+                self.queued -= 1
+                if not owner_queue:
+                    del self._queues[ticket.owner]
+                self._notify_waiting()
+        self._dispatch()
+
+    def _grant(self, ticket: AdmissionTicket) -> None:
+        ticket.granted = True
+        self.active += 1
+        ticket.wakeup.set()
+
+    def _dispatch(self) -> None:
+        granted_any = False
+        while self.active < self.max_concurrent and self._queues:
+            owner, owner_queue = next(iter(self._queues.items()))
+            ticket = owner_queue.popleft()
+            self.queued -= 1
+            if owner_queue:
+                self._queues.move_to_end(owner)
+            else:
+                del self._queues[owner]
+            self._grant(ticket)
+            granted_any = True
+        if granted_any:
+            self._notify_waiting()
+
+    def _notify_waiting(self) -> None:
+        # Everybody still waiting may have moved up; let them report their new position.
+        for owner_queue in self._queues.values():
+            for ticket in owner_queue:
+                ticket.wakeup.set()
@@ -0,0 +1,169 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Annotated, Any, Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import JWTError, jwk, jwt
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.principal_cache import Principal, principal_cache
+from app.core.settings import (
+    SECRET_KEY, REFRESH_SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+)
+from app.models.user import User as UserModel
+
+security = HTTPBearer()
+
+# Built once: handing jose a ready key skips its per-call key parsing.
+_access_key = jwk.construct(SECRET_KEY, ALGORITHM)
+_refresh_key = jwk.construct(REFRESH_SECRET_KEY, ALGORITHM)
+
+
+class TokenClaimsCache:
+    """
+    Decoded access-token claims by SHA-256 of the token.
+
+    A token's claims never change, so a verified token only needs its expiry
+    checked on later requests. Entries live for ``ttl`` seconds at most and
+    never past the token's own ``exp``.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._claims: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._claims.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if time.time() >= expires_at:
+                del self._claims[key]
+                return None
+            self._claims.move_to_end(key)
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl
+        if claims.get("exp") is not None:
+            expires_at = min(expires_at, float(claims["exp"]))
+        key = self._key(token)
+        with self._lock:
+            self._claims[key] = (expires_at, claims)
+            self._claims.move_to_end(key)
+            while len(self._claims) > self.max_entries:
+                self._claims.popitem(last=False)
+
+
+token_claims_cache = TokenClaimsCache(
+    ttl=settings.TOKEN_CLAIMS_CACHE_TTL, max_entries=settings.TOKEN_CLAIMS_CACHE_MAX_ENTRIES
+)
+
+
+# =====================> tokens <============================
+def _encode(data: dict, expire: datetime, key: str) -> str:
+    to_encode = data.copy()
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, key, algorithm=ALGORITHM)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    return _encode(data, expire, SECRET_KEY)
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Refresh tokens have their own key, so an access token can never be used as
+    one. The random ``jti`` keeps two sign-ins within the same second from
+    getting the same token, and so the same session hash.
+    """
+    expire = datetime.utcnow() + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    return _encode({**data, "jti": secrets.token_hex(16)}, expire, REFRESH_SECRET_KEY)
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Verified claims of an access token; raises ``JWTError`` for a bad or expired token."""
+    claims = token_claims_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, _access_key, algorithms=[ALGORITHM])
+        token_claims_cache.put(token, claims)
+    return claims
+
+def decode_refresh_token(token: str) -> Dict[str, Any]:
+    return jwt.decode(token, _refresh_key, algorithms=[ALGORITHM])
+
+def hash_refresh_token(token: str) -> str:
+    """Fixed-length lookup key for a refresh token's ``UserSession``."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+# =====================> dependencies <============================
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid authentication credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _require_active(is_active: bool) -> None:
+    if not is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+
+def _decode_claims(credentials: HTTPAuthorizationCredentials) -> Dict[str, Any]:
+    try:
+        payload = decode_access_token(credentials.credentials)
+    except JWTError:
+        raise _credentials_exception()
+    if payload.get("id") is None or payload.get("email") is None:
+        raise _credentials_exception()
+    return payload
+
+def _load_user(db: Session, payload: Dict[str, Any]) -> UserModel:
+    """Load the token's user by primary key and refresh its cached principal."""
+    user_id = payload["id"]
+    generation = principal_cache.generation(user_id)
+    user = db.get(UserModel, user_id)
+    # A token issued before an email change no longer identifies its user.
+    if user is None or user.email != payload["email"]:
+        raise _credentials_exception()
+    principal_cache.put(Principal.from_user(user), generation)
+    return user
+
+def get_current_principal(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    db: Annotated[Session, Depends(get_db)]
+) -> Principal:
+    """
+    The authenticated user as a cached ``Principal``.
+
+    A cache hit costs no database round trip, so endpoints that only need the
+    user's id, role or name should depend on this rather than on
+    ``get_current_user``.
+    """
+    payload = _decode_claims(credentials)
+    principal = principal_cache.get(payload["id"])
+    if principal is None or principal.email != payload["email"]:
+        principal = Principal.from_user(_load_user(db, payload))
+    _require_active(principal.is_active)
+    return principal
+
+def get_current_user(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    db: Annotated[Session, Depends(get_db)]
+) -> UserModel:
+    user = _load_user(db, _decode_claims(credentials))
+    _require_active(user.is_active)
+    return user
@@ -1,5 +1,7 @@
 # app/core/config.py
 
+from typing import List
+
 from pydantic_settings import BaseSettings
 import logging
 
@@ -10,13 +12,71 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
 
     DATABASE_URL: str 
+    WEB_CONCURRENCY: int = 1  # worker processes; the variable uvicorn and gunicorn read their default from
 
     OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_BASE_URLS: str = ""  # comma-separated pool; falls back to OLLAMA_BASE_URL
+    OLLAMA_ROUTING_STRATEGY: str = "least_outstanding"  # or "latency"
     OLLAMA_MODEL: str = "mistral" 
     OLLAMA_TIMEOUT: float = 60.0 
+    OLLAMA_HEALTH_INTERVAL: float = 15.0
+    OLLAMA_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    OLLAMA_CIRCUIT_RESET_TIMEOUT: float = 30.0
+    OLLAMA_MAX_CONCURRENCY: int = 2  # per backend
+    OLLAMA_QUEUE_MAX_DEPTH: int = 50
+    OLLAMA_QUEUE_MAX_PER_USER: int = 2
+
+    CHAT_FLUSH_MAX_BATCH: int = 100
+    CHAT_FLUSH_INTERVAL: float = 0.5
+    CHAT_FLUSH_MAX_PENDING: int = 10000  # messages beyond this are dropped while the database is down
+    CHAT_FLUSH_MAX_BACKOFF: float = 30.0
+    CHAT_HISTORY_LIMIT: int = 50
+    CHAT_CACHE_BACKEND: str = "memory"  # "memory" or "redis"; redis is used whenever WEB_CONCURRENCY > 1
+    CHAT_CACHE_TTL: float = 1800.0
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 1536
+    CHAT_SUMMARY_TOKEN_BUDGET: int = 256
+    CHAT_CATALOG_TOP_K: int = 5
+    CHAT_CATALOG_TOKEN_BUDGET: int = 384
+    COURSE_INDEX_PATH: str = "data/course_index.json"
+    STUDENT_SNAPSHOT_TTL: float = 600.0
+    STUDENT_SNAPSHOT_SHARED_TTL: float = 30.0  # TTL cap when WEB_CONCURRENCY > 1; other workers' edits don't invalidate
+    CATALOG_CHECK_INTERVAL: float = 30.0  # how stale another worker's catalog edits may look
+    RESPONSE_CACHE_TTL: float = 3600.0
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    RESPONSE_CACHE_SIMILARITY: float = 0.92  # 1.0 disables similarity lookup
+    RESPONSE_CACHE_REPLAY_DELAY: float = 0.0
+    SSE_HEARTBEAT_INTERVAL: float = 15.0
+    CHAT_REPLY_GRACE_PERIOD: float = 60.0
+    CHAT_CHECKPOINT_INTERVAL: float = 2.0
+    CHAT_STREAMING_STALE_AFTER: float = 900.0  # a reply still streaming after this long is treated as interrupted
+
+    PRINCIPAL_CACHE_BACKEND: str = "memory"  # "memory" or "redis"; redis is used whenever WEB_CONCURRENCY > 1
+    PRINCIPAL_CACHE_TTL: float = 120.0
+    PRINCIPAL_CACHE_LOCAL_TTL: float = 10.0  # per-worker copy when the redis tier is on
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    TOKEN_CLAIMS_CACHE_TTL: float = 300.0
+    TOKEN_CLAIMS_CACHE_MAX_ENTRIES: int = 10000
+    PASSWORD_HASH_ROUNDS: int = 12  # changing it rehashes passwords at next sign-in
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    OTP_BACKEND: str = "memory"  # "memory" or "redis"; redis is used whenever WEB_CONCURRENCY > 1
+    OTP_TTL: float = 300.0
+    OTP_MAX_ATTEMPTS: int = 5
+
+    SESSION_ACTIVITY_FLUSH_INTERVAL: float = 30.0
+    SESSION_SWEEP_INTERVAL: float = 3600.0
+    SESSION_IDLE_TIMEOUT_DAYS: int = 30  # sessions unused this long are deactivated
+    SESSION_RETENTION_DAYS: int = 30  # inactive sessions are deleted this long after their last activity
+
+    METRICS_TOKEN: str = ""  # bearer token for GET /metrics; the endpoint is disabled while empty
 
     REDIS_URL: str = "redis://localhost:6379/0" 
 
+    @property
+    def ollama_base_urls(self) -> List[str]:
+        urls = [url.strip() for url in self.OLLAMA_BASE_URLS.split(",") if url.strip()]
+        return urls or [self.OLLAMA_BASE_URL]
+
     class Config:
         env_file = ".env"
 
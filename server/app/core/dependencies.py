@@ -1,38 +1,4 @@
-from fastapi import Depends, HTTPException, status
-from typing import Annotated
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
-
 from app.core.database import get_db
-from app.core.settings import SECRET_KEY, ALGORITHM
-from app.models.user import User as UserModel
+from app.core.auth import security, get_current_principal, get_current_user
 
-security = HTTPBearer()
 oauth2_scheme = security  # Alias for backward compatibility
-
-def get_current_user(
-    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
-    db: Annotated[Session, Depends(get_db)]
-) -> UserModel:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid authentication credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("email")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = db.query(UserModel).filter(UserModel.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
- 
-
-
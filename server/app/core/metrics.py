@@ -0,0 +1,237 @@
+import abc
+import bisect
+import functools
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds, for everything from a DB round trip to a full CPU-bound generation.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 1536, 2048, 4096, 8192)
+RATE_BUCKETS = (1, 2, 4, 6, 8, 10, 15, 20, 30, 50, 100)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    @abc.abstractmethod
+    def _render_child(self, key, child) -> List[str]:
+        """Exposition lines for one label combination."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0.0) + amount
+
+    def _render_child(self, key, value) -> List[str]:
+        return [f"{self.name}_total{_label_text(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = value
+
+    def _render_child(self, key, value) -> List[str]:
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = _HistogramChild(len(self.buckets))
+            child.counts[index] += 1
+            child.sum += value
+            child.count += 1
+
+    def _render_child(self, key, child: _HistogramChild) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            labels = _label_text(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _label_text(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """``collector`` runs before every scrape, e.g. to copy current queue sizes into gauges."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+CHAT_REQUEST_SECONDS = registry.histogram(
+    "chat_request_duration_seconds", "Chat request time from arrival to the end of the streamed reply.", ["outcome"]
+)
+CHAT_QUEUE_WAIT_SECONDS = registry.histogram(
+    "chat_queue_wait_seconds", "Time a chat request waited for a generation slot."
+)
+CHAT_FIRST_TOKEN_SECONDS = registry.histogram(
+    "chat_time_to_first_token_seconds", "Time from request arrival to the first reply token.", ["source"]
+)
+CHAT_INTER_TOKEN_SECONDS = registry.histogram(
+    "chat_inter_token_seconds", "Gap between consecutive streamed reply chunks.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 1, 2.5, 5),
+)
+CHAT_PROMPT_TOKENS = registry.histogram(
+    "chat_prompt_tokens", "Estimated tokens in the prompt sent to the model.", buckets=TOKEN_BUCKETS
+)
+CHAT_DB_SECONDS = registry.histogram(
+    "chat_db_seconds", "Time spent in chat persistence calls.", ["operation"]
+)
+CHAT_MESSAGES_DROPPED = registry.counter(
+    "chat_messages_dropped", "Chat messages given up on by the write-behind queue.", ["reason"]
+)
+OLLAMA_PROMPT_EVAL_TOKENS = registry.histogram(
+    "ollama_prompt_eval_tokens", "Prompt tokens evaluated by Ollama, from the final stream frame.", buckets=TOKEN_BUCKETS
+)
+OLLAMA_EVAL_TOKENS = registry.histogram(
+    "ollama_eval_tokens", "Tokens generated by Ollama, from the final stream frame.", buckets=TOKEN_BUCKETS
+)
+OLLAMA_PROMPT_EVAL_SECONDS = registry.histogram(
+    "ollama_prompt_eval_seconds", "Ollama prompt evaluation time, from the final stream frame."
+)
+OLLAMA_LOAD_SECONDS = registry.histogram(
+    "ollama_load_seconds", "Ollama model load time, from the final stream frame."
+)
+OLLAMA_TOKENS_PER_SECOND = registry.histogram(
+    "ollama_tokens_per_second", "Ollama generation speed (eval_count / eval_duration).", buckets=RATE_BUCKETS
+)
+PASSWORD_HASH_WAIT_SECONDS = registry.histogram(
+    "password_hash_queue_wait_seconds", "Time a bcrypt operation waited for a hashing thread.", ["operation"]
+)
+PASSWORD_HASH_SECONDS = registry.histogram(
+    "password_hash_seconds", "Time a bcrypt operation took once running.", ["operation"]
+)
+PASSWORD_HASH_REJECTED = registry.counter(
+    "password_hash_rejected", "bcrypt operations refused because the hashing queue was full.", ["operation"]
+)
+
+
+class RequestTimings:
+    """Per-request accumulator, shared through ``current_timings`` with the code a request calls."""
+
+    __slots__ = ("started", "db_seconds", "prompt_tokens")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.prompt_tokens: Optional[int] = None
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+def timed_db(operation: str):
+    """Record an async persistence call in ``chat_db_seconds`` and in the current request's DB time."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                CHAT_DB_SECONDS.observe(elapsed, operation=operation)
+                timings = current_timings.get()
+                if timings is not None:
+                    timings.db_seconds += elapsed
+        return wrapper
+    return decorator
@@ -11,10 +11,13 @@ from sqladmin import Admin, ModelView
 from app.core.database import engine
 from app.models.admin import UserAdmin
 from app.api.routers.main_router import router
+from app.api.endpoints.metrics import metrics_module
 # from app.core.settings import config
 
 def init_routers(app_: FastAPI) -> None:
     app_.include_router(router)
+    # Served outside /api, where Prometheus scrapes by default.
+    app_.include_router(metrics_module)
     # admin dashboard 
     admin = Admin(app_, engine)
     admin.add_view(UserAdmin)
@@ -1,30 +1,141 @@
-import random
+import heapq
+import hmac
+import logging
+import secrets
 import string
+import threading
 import time
+from typing import Dict, List, Tuple
 
-otp_store = {}
+from app.core.config import settings
 
-OTP_EXPIRATION_SECONDS = 300
+logger = logging.getLogger(__name__)
+
+OTP_EXPIRATION_SECONDS = settings.OTP_TTL
+
+
+class _OTPEntry:
+    __slots__ = ("code", "expires_at", "attempts")
+
+    def __init__(self, code: str, expires_at: float):
+        self.code = code
+        self.expires_at = expires_at
+        self.attempts = 0
+
+
+class MemoryOTPStore:
+    """
+    Per-process OTP store.
+
+    Expiry times sit in a heap, so every call drops the codes that have expired
+    since the last one without scanning the whole store. A code is consumed by
+    a correct guess and burnt after ``max_attempts`` guesses.
+    """
+
+    def __init__(self, ttl: float, max_attempts: int):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _OTPEntry] = {}
+        self._expiries: List[Tuple[float, str]] = []
+
+    def _sweep(self, now: float) -> None:
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, email = heapq.heappop(self._expiries)
+            entry = self._entries.get(email)
+            # A newer code for the same address has its own heap item.
+            if entry is not None and entry.expires_at == expires_at:
+                del self._entries[email]
+
+    def set(self, email: str, code: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = _OTPEntry(code, now + self.ttl)
+            self._entries[email] = entry
+            heapq.heappush(self._expiries, (entry.expires_at, email))
+
+    def verify(self, email: str, code: str) -> bool:
+        with self._lock:
+            self._sweep(time.monotonic())
+            entry = self._entries.get(email)
+            if entry is None:
+                return False
+            entry.attempts += 1
+            matched = hmac.compare_digest(entry.code.encode(), code.encode())
+            if matched or entry.attempts >= self.max_attempts:
+                del self._entries[email]
+            return matched
+
+
+class RedisOTPStore:
+    """
+    OTPs in Redis, shared by every worker and expired by Redis itself.
+
+    Counting the guess, comparing the code and consuming it all happen in one
+    script, so concurrent guesses against one address can't exceed
+    ``max_attempts`` and a code can't be redeemed twice. The comparison runs
+    inside Redis, where its timing isn't observable to the caller.
+    """
+
+    # Count the guess; consume the code on a match or on the last allowed guess.
+    _CLAIM = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    local matched = redis.call('HGET', KEYS[1], 'code') == ARGV[2]
+    if matched or attempts >= tonumber(ARGV[1]) then
+        redis.call('DEL', KEYS[1])
+    end
+    return matched and 1 or 0
+    """
+
+    def __init__(self, redis_url: str, ttl: float, max_attempts: int):
+        import redis
+
+        self.redis = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        self.ttl = int(ttl)
+        self.max_attempts = max_attempts
+        self._claim = self.redis.register_script(self._CLAIM)
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"otp:{email}"
+
+    def set(self, email: str, code: str) -> None:
+        key = self._key(email)
+        with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={"code": code, "attempts": 0})
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def verify(self, email: str, code: str) -> bool:
+        return self._claim(keys=[self._key(email)], args=[self.max_attempts, code]) == 1
+
+
+def create_otp_store():
+    if settings.OTP_BACKEND == "redis" or settings.WEB_CONCURRENCY > 1:
+        if settings.OTP_BACKEND != "redis":
+            logger.warning(
+                f"Using the redis OTP store with {settings.WEB_CONCURRENCY} workers: "
+                f"a per-process store would reject codes issued by other workers"
+            )
+        return RedisOTPStore(settings.REDIS_URL, settings.OTP_TTL, settings.OTP_MAX_ATTEMPTS)
+    return MemoryOTPStore(settings.OTP_TTL, settings.OTP_MAX_ATTEMPTS)
+
+
+otp_store = create_otp_store()
 
 def generate_otp(length=6):
-    return ''.join(random.choices(string.digits, k=length))
+    return ''.join(secrets.choice(string.digits) for _ in range(length))
 
 def set_otp(email: str):
     otp = generate_otp()
-    expiry = time.time() + OTP_EXPIRATION_SECONDS
-    otp_store[email] = (otp, expiry)
+    otp_store.set(email, otp)
     print(f"[OTP] Sent OTP {otp} to {email}")
     return otp
 
 def verify_otp(email: str, submitted_otp: str) -> bool:
-    entry = otp_store.get(email)
-    if not entry:
-        return False
-    otp, expiry = entry
-    if time.time() > expiry:
-        del otp_store[email]
-        return False
-    if submitted_otp != otp:
-        return False
-    del otp_store[email]
-    return True
+    return otp_store.verify(email, submitted_otp)
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core import metrics
+from app.core.config import settings
+
+
+def create_password_context(rounds: int) -> CryptContext:
+    """
+    bcrypt at exactly ``rounds``. Pinning the minimum and maximum to the same
+    cost makes ``verify_and_update`` report every hash made at another cost, so
+    changing the setting rehashes passwords as their owners sign in.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+pwd_context = create_password_context(settings.PASSWORD_HASH_ROUNDS)
+
+
+class PasswordHasherBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    bcrypt on a dedicated, fixed-size thread pool.
+
+    Each hash or check takes a few hundred milliseconds of CPU. Running them
+    here keeps them off the event loop, and the pool size caps how many cores
+    a burst of sign-ins can take from everything else (bcrypt releases the GIL,
+    so threads run in parallel). Once ``max_pending`` operations are queued or
+    running, new ones are refused with ``PasswordHasherBusy`` instead of
+    queueing for longer than a client would wait.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_pending: int, retry_after: int = 5):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+
+    def _submit(self, operation: str, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                metrics.PASSWORD_HASH_REJECTED.inc(operation=operation)
+                raise PasswordHasherBusy(self.retry_after)
+            self.pending += 1
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            metrics.PASSWORD_HASH_WAIT_SECONDS.observe(started - submitted, operation=operation)
+            with self._lock:
+                self.active += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                metrics.PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+        def done(_):
+            # Also runs for work cancelled before it started.
+            with self._lock:
+                self.pending -= 1
+
+        future = self._executor.submit(run)
+        future.add_done_callback(done)
+        return future
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit("hash", self.context.hash, password))
+
+    def hash_blocking(self, password: str) -> str:
+        """For sync endpoints, which already run in a worker thread of their own."""
+        return self._submit("hash", self.context.hash, password).result()
+
+    async def verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """``(valid, new_hash)``; ``new_hash`` is set when the stored hash uses an outdated cost."""
+        if not hashed:
+            return False, None
+        return await asyncio.wrap_future(
+            self._submit("verify", self.context.verify_and_update, password, hashed)
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
@@ -0,0 +1,186 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+
+class Principal:
+    """
+    The authenticated user as most endpoints need it: who they are and what
+    they may do, without an ORM object or a database session behind it.
+    """
+
+    __slots__ = ("id", "email", "role", "first_name", "is_active")
+
+    def __init__(self, id: int, email: str, role: UserRole, first_name: Optional[str], is_active: bool):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.first_name = first_name
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.email, user.role, user.first_name, user.is_active)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "email": self.email,
+            "role": self.role.value if self.role is not None else None,
+            "first_name": self.first_name,
+            "is_active": self.is_active,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Principal":
+        role = UserRole(data["role"]) if data.get("role") is not None else None
+        return cls(data["id"], data["email"], role, data.get("first_name"), data.get("is_active", False))
+
+    def __repr__(self):
+        return f"<Principal id={self.id} role={self.role}>"
+
+
+class PrincipalCache:
+    """
+    Per-process LRU of ``Principal`` objects by user id, with an optional
+    shared Redis tier.
+
+    Entries are dropped when a change to the user row is committed through any
+    ORM session. A per-user generation counter keeps a principal loaded before
+    such a commit from being stored after it. Other workers only learn about a
+    change through the Redis tier, so with Redis enabled the local tier keeps
+    entries for ``local_ttl`` seconds only; that bounds how long another worker
+    may still see a deactivated or re-roled user.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000, redis_url: Optional[str] = None, local_ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.local_ttl = ttl if redis_url is None or local_ttl is None else min(ttl, local_ttl)
+        self.redis = None
+        if redis_url is not None:
+            import redis
+
+            self.redis = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[float, Principal]]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"auth:principal:{user_id}"
+
+    def generation(self, user_id: int) -> int:
+        """Read before loading a user from the database; pass it back to ``put``."""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, principal = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return principal
+                del self._entries[user_id]
+
+        principal = self._get_shared(user_id)
+        with self._lock:
+            if principal is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store_local(principal)
+        return principal
+
+    def put(self, principal: Principal, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(principal.id, 0) != generation:
+                return
+            self._store_local(principal)
+        if self.redis is not None:
+            try:
+                self.redis.set(self._key(principal.id), json.dumps(principal.to_dict()), ex=int(self.ttl))
+            except Exception as e:
+                logger.warning(f"Principal cache write failed: {e}")
+
+    def invalidate(self, user_ids: Set[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        if self.redis is not None and user_ids:
+            try:
+                self.redis.delete(*(self._key(user_id) for user_id in user_ids))
+            except Exception as e:
+                logger.warning(f"Principal cache invalidate failed: {e}")
+
+    def _store_local(self, principal: Principal) -> None:
+        self._entries[principal.id] = (time.monotonic() + self.local_ttl, principal)
+        self._entries.move_to_end(principal.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_shared(self, user_id: int) -> Optional[Principal]:
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Principal cache read failed: {e}")
+            return None
+        return Principal.from_dict(json.loads(raw)) if raw else None
+
+
+def create_principal_cache() -> PrincipalCache:
+    shared = settings.PRINCIPAL_CACHE_BACKEND == "redis" or settings.WEB_CONCURRENCY > 1
+    if shared and settings.PRINCIPAL_CACHE_BACKEND != "redis":
+        logger.warning(
+            f"Using the redis principal cache with {settings.WEB_CONCURRENCY} workers: "
+            f"a per-process cache would keep serving users changed through other workers"
+        )
+    return PrincipalCache(
+        ttl=settings.PRINCIPAL_CACHE_TTL,
+        max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+        redis_url=settings.REDIS_URL if shared else None,
+        local_ttl=settings.PRINCIPAL_CACHE_LOCAL_TTL,
+    )
+
+
+principal_cache = create_principal_cache()
+
+_USERS_CHANGED = "principal_changed_user_ids"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_user_changes(session, flush_context):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            session.info.setdefault(_USERS_CHANGED, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    user_ids = session.info.pop(_USERS_CHANGED, None)
+    if user_ids:
+        principal_cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_USERS_CHANGED, None)
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.course import Course
+from app.models.enums import CourseLevel
+from app.models.prerequisite import Prerequisite
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCourse:
+    """Read-only snapshot of a ``Course`` row, safe to share across requests and sessions."""
+
+    __slots__ = (
+        "id", "course_code", "title", "description", "credits",
+        "level", "category", "created_at", "updated_at",
+    )
+
+    def __init__(self, course: Course):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(course, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CatalogCourse is immutable")
+
+    def __repr__(self):
+        return f"<CatalogCourse {self.course_code}>"
+
+
+class PrerequisiteGraph:
+    """
+    Immutable prerequisite DAG for the whole catalog.
+
+    ``prerequisites[course_id]`` is the set of course ids that must be completed
+    before ``course_id`` can be taken; ``dependents`` is the reverse adjacency.
+    """
+
+    def __init__(self, courses: Iterable[Course], edges: Iterable[Tuple[int, int]], version: int):
+        self.version = version
+        self.courses: Dict[int, CatalogCourse] = {c.id: CatalogCourse(c) for c in courses}
+        self.course_ids: Tuple[int, ...] = tuple(sorted(self.courses))
+
+        prerequisites: Dict[int, set] = {}
+        dependents: Dict[int, set] = {}
+        for course_id, prerequisite_id in edges:
+            prerequisites.setdefault(course_id, set()).add(prerequisite_id)
+            dependents.setdefault(prerequisite_id, set()).add(course_id)
+
+        self.prerequisites: Dict[int, FrozenSet[int]] = {
+            course_id: frozenset(ids) for course_id, ids in prerequisites.items()
+        }
+        self.dependents: Dict[int, Tuple[int, ...]] = {
+            course_id: tuple(sorted(ids)) for course_id, ids in dependents.items()
+        }
+
+        # Bitset view of the catalog: bit i stands for course_ids[i].
+        self.bits: Dict[int, int] = {course_id: i for i, course_id in enumerate(self.course_ids)}
+        self.level_100_mask = self.mask_of(
+            c.id for c in self.courses.values() if c.level == CourseLevel.LEVEL_100
+        )
+        no_prerequisites_mask = 0
+        groups: Dict[int, int] = {}
+        for course_id in self.course_ids:
+            prerequisite_mask = self.mask_of(self.prerequisites_of(course_id))
+            if prerequisite_mask:
+                groups[prerequisite_mask] = groups.get(prerequisite_mask, 0) | (1 << self.bits[course_id])
+            else:
+                no_prerequisites_mask |= 1 << self.bits[course_id]
+        self.no_prerequisites_mask = no_prerequisites_mask
+        # (prerequisite mask, mask of courses sharing exactly that prerequisite set)
+        self.prerequisite_groups: Tuple[Tuple[int, int], ...] = tuple(groups.items())
+
+    def mask_of(self, course_ids: Iterable[int]) -> int:
+        mask = 0
+        for course_id in course_ids:
+            bit = self.bits.get(course_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def unlocked_mask(self, completed_mask: int) -> int:
+        """Courses with at least one prerequisite, all of which are set in ``completed_mask``."""
+        unlocked = 0
+        for prerequisite_mask, course_mask in self.prerequisite_groups:
+            if prerequisite_mask & ~completed_mask == 0:
+                unlocked |= course_mask
+        return unlocked & ~completed_mask
+
+    def courses_in(self, mask: int, limit: Optional[int] = None) -> List[CatalogCourse]:
+        """Decode a course bitset into catalog courses in ascending course id order."""
+        courses = []
+        while mask and (limit is None or len(courses) < limit):
+            low = mask & -mask
+            courses.append(self.courses[self.course_ids[low.bit_length() - 1]])
+            mask ^= low
+        return courses
+
+    def prerequisites_of(self, course_id: int) -> FrozenSet[int]:
+        return self.prerequisites.get(course_id, frozenset())
+
+    def missing_prerequisites(self, course_id: int, completed_ids: FrozenSet[int]) -> FrozenSet[int]:
+        return self.prerequisites_of(course_id) - completed_ids
+
+    def is_eligible(self, course_id: int, completed_ids: FrozenSet[int]) -> bool:
+        return course_id not in completed_ids and not self.missing_prerequisites(course_id, completed_ids)
+
+
+class PrerequisiteGraphIndex:
+    """
+    Process-wide holder for the current ``PrerequisiteGraph``.
+
+    The graph is built lazily from the ``courses`` and ``prerequisites`` tables and
+    rebuilt on the next access after any committed change to either table. Commits
+    made by other workers don't reach this process, so at most every
+    ``check_interval`` seconds a one-row aggregate of both tables is compared
+    with the one the graph was built from.
+    """
+
+    def __init__(self, check_interval: float = 30.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._graph: Optional[PrerequisiteGraph] = None
+        self._version = 0
+        self._stamp: Optional[tuple] = None
+        self._check_at = 0.0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._graph = None
+
+    @staticmethod
+    def _catalog_stamp(db: Session) -> tuple:
+        """Changes with any insert or delete, and with updates made through the ORM."""
+        return tuple(db.execute(select(
+            select(func.count(Course.id)).scalar_subquery(),
+            select(func.max(Course.id)).scalar_subquery(),
+            select(func.max(Course.updated_at)).scalar_subquery(),
+            select(func.count(Prerequisite.id)).scalar_subquery(),
+            select(func.max(Prerequisite.id)).scalar_subquery(),
+            select(func.sum(Prerequisite.course_id)).scalar_subquery(),
+            select(func.sum(Prerequisite.prerequisite_course_id)).scalar_subquery(),
+        )).one())
+
+    def get(self, db: Session) -> PrerequisiteGraph:
+        graph = self._graph
+        if graph is not None and time.monotonic() < self._check_at:
+            return graph
+
+        with self._lock:
+            if self._graph is not None:
+                if time.monotonic() < self._check_at:
+                    return self._graph
+                stamp = self._catalog_stamp(db)
+                self._check_at = time.monotonic() + self.check_interval
+                if stamp == self._stamp:
+                    return self._graph
+                logger.info("Catalog changed outside this process, rebuilding the prerequisite graph")
+                self._version += 1
+            else:
+                stamp = self._catalog_stamp(db)
+            version = self._version
+            courses = db.query(Course).all()
+            edges = db.query(Prerequisite.course_id, Prerequisite.prerequisite_course_id).all()
+            graph = PrerequisiteGraph(courses, edges, version)
+            self._graph = graph
+            self._stamp = stamp
+            self._check_at = time.monotonic() + self.check_interval
+            logger.info(
+                "Built prerequisite graph v%s: %s courses, %s edges",
+                version, len(graph.courses), len(edges),
+            )
+            return graph
+
+
+prerequisite_graph_index = PrerequisiteGraphIndex(check_interval=settings.CATALOG_CHECK_INTERVAL)
+
+_CATALOG_CHANGED = "catalog_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Course, Prerequisite)):
+            session.info[_CATALOG_CHANGED] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop(_CATALOG_CHANGED, False):
+        prerequisite_graph_index.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_CATALOG_CHANGED, None)
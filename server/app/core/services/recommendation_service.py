@@ -1,11 +1,9 @@
-from typing import List
+from typing import Dict, List, Sequence
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
 
-from app.models.course import Course
 from app.models.student_course import StudentCourse
-from app.models.prerequisite import Prerequisite
-from app.schemas.course import CourseRecommendation
+from app.schemas.course import CourseRead, CourseRecommendation
+from app.core.services.prerequisite_graph import PrerequisiteGraph, prerequisite_graph_index
 
 class RecommendationService:
     def __init__(self, db: Session):
@@ -15,88 +13,79 @@ class RecommendationService:
         """
         Get course recommendations for a student based on their progress.
         """
-        # Get student's completed courses
-        completed_courses = (
-            self.db.query(StudentCourse)
-            .filter(
-                StudentCourse.user_id == user_id,
-                StudentCourse.completed == True
-            )
-            .all()
-        )
-        
-        completed_course_ids = {sc.course_id for sc in completed_courses}
-        
-        if not completed_course_ids:
-            # If no courses completed, recommend level 100 courses
-            base_courses = (
-                self.db.query(Course)
-                .filter(Course.level == "100")
-                .limit(limit)
+        return self.get_bulk_course_recommendations([user_id], limit)[user_id]
+
+    def get_bulk_course_recommendations(
+        self, user_ids: Sequence[int], limit: int = 5
+    ) -> Dict[int, List[CourseRecommendation]]:
+        """
+        Get course recommendations for many students at once.
+
+        All transcripts are loaded with one query; eligibility is then scored
+        against the cached prerequisite graph as bitsets of completed course ids.
+        """
+        graph = prerequisite_graph_index.get(self.db)
+
+        completed_masks: Dict[int, int] = {user_id: 0 for user_id in user_ids}
+        good_grades: Dict[int, bool] = {user_id: False for user_id in user_ids}
+        if completed_masks:
+            completed_courses = (
+                self.db.query(StudentCourse.user_id, StudentCourse.course_id, StudentCourse.grade)
+                .filter(
+                    StudentCourse.user_id.in_(list(completed_masks)),
+                    StudentCourse.completed == True
+                )
                 .all()
             )
+            for user_id, course_id, grade in completed_courses:
+                bit = graph.bits.get(course_id)
+                if bit is not None:
+                    completed_masks[user_id] |= 1 << bit
+                if grade in ['A', 'B']:
+                    good_grades[user_id] = True
+
+        return {
+            user_id: self._recommend(graph, completed_mask, good_grades[user_id], limit)
+            for user_id, completed_mask in completed_masks.items()
+        }
+
+    def _recommend(
+        self, graph: PrerequisiteGraph, completed_mask: int, good_grades: bool, limit: int
+    ) -> List[CourseRecommendation]:
+        if not completed_mask:
+            # If no courses completed, recommend level 100 courses
             return [
                 CourseRecommendation(
-                    course=course,
+                    course=CourseRead.model_validate(course, from_attributes=True),
                     confidence_score=0.8,
                     reason="Recommended as a starting course"
                 )
-                for course in base_courses
+                for course in graph.courses_in(graph.level_100_mask, limit)
             ]
 
-        # Get courses that have prerequisites met
-        eligible_courses = []
-        for course in self.db.query(Course).all():
-            if course.id in completed_course_ids:
-                continue
-
-            # Check prerequisites
-            prerequisites = (
-                self.db.query(Prerequisite)
-                .filter(Prerequisite.course_id == course.id)
-                .all()
+        # Courses whose prerequisites are all met rank above courses with none
+        if good_grades:
+            confidence = 0.9
+            reason = "Prerequisites completed with good performance in related courses"
+        else:
+            confidence = 0.8
+            reason = "Prerequisites completed"
+        ranked = [
+            (course, confidence, reason)
+            for course in graph.courses_in(graph.unlocked_mask(completed_mask), limit)
+        ]
+        if len(ranked) < limit:
+            open_mask = graph.no_prerequisites_mask & ~completed_mask
+            ranked.extend(
+                (course, 0.7, "No prerequisites required")
+                for course in graph.courses_in(open_mask, limit - len(ranked))
             )
 
-            if not prerequisites:
-                eligible_courses.append((course, 0.7, "No prerequisites required"))
-                continue
-
-            # Check if all prerequisites are met
-            prereq_met = True
-            for prereq in prerequisites:
-                if prereq.prerequisite_course_id not in completed_course_ids:
-                    prereq_met = False
-                    break
-
-            if prereq_met:
-                # Calculate confidence based on grades in prerequisite courses
-                confidence = 0.8
-                reason = "Prerequisites completed"
-                
-                # Check if student performed well in related courses
-                related_courses = (
-                    self.db.query(StudentCourse)
-                    .filter(
-                        StudentCourse.user_id == user_id,
-                        StudentCourse.course_id.in_(completed_course_ids)
-                    )
-                    .all()
-                )
-                
-                good_grades = sum(1 for sc in related_courses if sc.grade in ['A', 'B'])
-                if good_grades:
-                    confidence += 0.1
-                    reason += " with good performance in related courses"
-                
-                eligible_courses.append((course, confidence, reason))
-
-        # Sort by confidence score and limit results
-        eligible_courses.sort(key=lambda x: x[1], reverse=True)
         return [
             CourseRecommendation(
-                course=course,
+                course=CourseRead.model_validate(course, from_attributes=True),
                 confidence_score=score,
                 reason=reason
             )
-            for course, score, reason in eligible_courses[:limit]
-        ] 
\ No newline at end of file
+            for course, score, reason in ranked
+        ]
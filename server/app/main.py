@@ -6,6 +6,11 @@ import logging
 import os
 
 from app.core.config import settings 
+from app.services.ai_service import ollama_service
+from app.services.chat_history_service import abort_stale_replies
+from app.services.chat_persistence_queue import chat_persistence_queue
+from app.services.session_activity import session_activity
+from app.core.passwords import password_hasher
 from fastapi_limiter import FastAPILimiter
 import redis.asyncio as redis 
 
@@ -38,3 +43,18 @@ async def startup_event():
         logger.info("FastAPI-Limiter initialized with Redis.")
     except Exception as e:
         logger.error(f"Failed to initialize FastAPI-Limiter: {e}")
+
+    ollama_service.start_health_prober()
+    chat_persistence_queue.start()
+    session_activity.start()
+    try:
+        await abort_stale_replies()
+    except Exception as e:
+        logger.error(f"Failed to abort stale streaming replies: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await ollama_service.stop_health_prober()
+    await chat_persistence_queue.stop()
+    await session_activity.stop()
+    password_hasher.shutdown()
@@ -1,12 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UUID
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid 
 
 from app.core.database import Base 
+from app.models.enums import ChatMessageStatus
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_timestamp", "session_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
@@ -14,6 +18,9 @@ class ChatMessage(Base):
     role = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # AI replies are checkpointed while they stream; see chat_history_service.start_ai_reply.
+    status = Column(String(16), nullable=False, default=ChatMessageStatus.COMPLETE.value,
+                    server_default=ChatMessageStatus.COMPLETE.value)
 
     user = relationship("User", back_populates="chat_messages")
 
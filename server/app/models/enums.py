@@ -16,3 +16,8 @@ class CourseLevel(str, Enum):
     LEVEL_300 = "300"
     LEVEL_400 = "400"
     GRADUATE  = "Graduate"
+
+class ChatMessageStatus(str, Enum):
+    STREAMING = "streaming"
+    COMPLETE  = "complete"
+    ABORTED   = "aborted"
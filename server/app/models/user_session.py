@@ -9,11 +9,14 @@ class UserSession(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     refresh_token = Column(String, nullable=False)
+    # SHA-256 hex of refresh_token; sessions are looked up by this, not the token.
+    refresh_token_hash = Column(String(64), nullable=True, index=True)
     device_info = Column(String, nullable=True)
     ip_address = Column(String, nullable=True)
     is_active = Column(Boolean, server_default=text("true"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     last_activity = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
 
     # Relationship
     user = relationship("User", back_populates="sessions") 
\ No newline at end of file
@@ -50,3 +50,11 @@ class CourseRecommendation(BaseModel):
         "orm_mode": True,
         "use_enum_values": True
     }
+
+class BulkRecommendationRequest(BaseModel):
+    user_ids: list[int] = Field(..., min_length=1, max_length=200)
+    limit: int = Field(5, ge=1, le=10)
+
+class StudentRecommendations(BaseModel):
+    user_id: int
+    recommendations: list[CourseRecommendation]
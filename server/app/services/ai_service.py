@@ -1,29 +1,178 @@
+import asyncio
+import hashlib
 import json
 import logging
+import time
 import httpx
-from typing import Dict, Any, AsyncGenerator, List # Import AsyncGenerator and List
+from datetime import datetime, timezone
+from typing import Dict, Any, AsyncGenerator, List, Optional # Import AsyncGenerator and List
 
 from app.core.config import settings 
+from app.core.admission import AdmissionController
+from app.core import metrics
+from app.services.ollama_pool import OllamaBackend, OllamaBackendPool
+from app.utils.ndjson import aiter_ndjson
 
 logger = logging.getLogger(__name__)
 
+_END_OF_STREAM = object()
+
+
+class GenerationStats:
+    """Timings Ollama reports in the final frame of a stream; durations are in seconds."""
+
+    __slots__ = (
+        "backend", "prompt_eval_count", "eval_count", "total_duration",
+        "load_duration", "prompt_eval_duration", "eval_duration",
+    )
+
+    def __init__(self):
+        self.backend: Optional[str] = None
+        self.prompt_eval_count: Optional[int] = None
+        self.eval_count: Optional[int] = None
+        self.total_duration: Optional[float] = None
+        self.load_duration: Optional[float] = None
+        self.prompt_eval_duration: Optional[float] = None
+        self.eval_duration: Optional[float] = None
+
+    @classmethod
+    def from_frame(cls, frame: Dict[str, Any], backend: str) -> "GenerationStats":
+        stats = cls()
+        stats.backend = backend
+        stats.prompt_eval_count = frame.get("prompt_eval_count")
+        stats.eval_count = frame.get("eval_count")
+        for field in ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"):
+            nanoseconds = frame.get(field)
+            if nanoseconds is not None:
+                setattr(stats, field, nanoseconds / 1e9)
+        return stats
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if not self.eval_count or not self.eval_duration:
+            return None
+        return self.eval_count / self.eval_duration
+
+    def copy_to(self, other: "GenerationStats") -> None:
+        for field in self.__slots__:
+            setattr(other, field, getattr(self, field))
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.__slots__}
+        data["tokens_per_second"] = self.tokens_per_second
+        return data
+
+    def observe(self) -> None:
+        if self.prompt_eval_count is not None:
+            metrics.OLLAMA_PROMPT_EVAL_TOKENS.observe(self.prompt_eval_count)
+        if self.eval_count is not None:
+            metrics.OLLAMA_EVAL_TOKENS.observe(self.eval_count)
+        if self.prompt_eval_duration is not None:
+            metrics.OLLAMA_PROMPT_EVAL_SECONDS.observe(self.prompt_eval_duration)
+        if self.load_duration is not None:
+            metrics.OLLAMA_LOAD_SECONDS.observe(self.load_duration)
+        if self.tokens_per_second is not None:
+            metrics.OLLAMA_TOKENS_PER_SECOND.observe(self.tokens_per_second)
+
+
+class _InFlightGeneration:
+    """One upstream generation shared by every request with the same prompt fingerprint."""
+
+    __slots__ = ("subscribers", "chunks", "done", "task", "stats")
+
+    def __init__(self):
+        self.subscribers: List[asyncio.Queue] = []
+        # Chunks produced so far, replayed to subscribers that join late.
+        self.chunks: List[str] = []
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+        self.stats = GenerationStats()
+
+
 class OllamaService:
     def __init__(self):
-        self.base_url = settings.OLLAMA_BASE_URL 
         self.model = settings.OLLAMA_MODEL
         self.client = httpx.AsyncClient(timeout=settings.OLLAMA_TIMEOUT)
+        self.pool = OllamaBackendPool(
+            settings.ollama_base_urls,
+            strategy=settings.OLLAMA_ROUTING_STRATEGY,
+            failure_threshold=settings.OLLAMA_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.OLLAMA_CIRCUIT_RESET_TIMEOUT,
+        )
+        self.base_url = self.pool.backends[0].base_url
+        self.admission = AdmissionController(
+            max_concurrent=settings.OLLAMA_MAX_CONCURRENCY * len(self.pool.backends),
+            max_queue_depth=settings.OLLAMA_QUEUE_MAX_DEPTH,
+            max_per_owner=settings.OLLAMA_QUEUE_MAX_PER_USER,
+        )
+        self._prober: Optional[asyncio.Task] = None
+        self._in_flight: Dict[str, _InFlightGeneration] = {}
+        self.coalesced_requests = 0
+
+    def is_available(self) -> bool:
+        """Answer from cached breaker state; never touches the network."""
+        return self.pool.is_available()
+
+    @property
+    def healthy(self) -> Optional[bool]:
+        probed = [b.healthy for b in self.pool.backends if b.healthy is not None]
+        return any(probed) if probed else None
+
+    def health_status(self) -> Dict[str, Any]:
+        backends = [b.status() for b in self.pool.backends]
+        circuits = {b["circuit"] for b in backends}
+        probes = [b.last_probe_at for b in self.pool.backends if b.last_probe_at]
+        return {
+            "healthy": self.healthy,
+            # Closed as long as any backend can take traffic.
+            "circuit": "closed" if "closed" in circuits else ("half_open" if "half_open" in circuits else "open"),
+            "last_probe_at": max(probes).isoformat() if probes else None,
+            "backends": backends,
+        }
+
+    async def probe(self) -> bool:
+        """Health-check every backend and feed each result into that backend's circuit breaker."""
+        await asyncio.gather(*(self._probe_backend(b) for b in self.pool.backends))
+        return bool(self.healthy)
+
+    async def _probe_backend(self, backend: OllamaBackend) -> None:
+        backend.healthy = await self.health_check(backend.base_url)
+        backend.last_probe_at = datetime.now(timezone.utc)
+        if backend.healthy:
+            backend.breaker.record_success()
+        else:
+            backend.breaker.record_failure()
+
+    async def _probe_forever(self, interval: float) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(interval)
+
+    def start_health_prober(self, interval: float = settings.OLLAMA_HEALTH_INTERVAL) -> None:
+        if self._prober is None or self._prober.done():
+            self._prober = asyncio.create_task(self._probe_forever(interval))
+
+    async def stop_health_prober(self) -> None:
+        if self._prober is not None:
+            self._prober.cancel()
+            try:
+                await self._prober
+            except asyncio.CancelledError:
+                pass
+            self._prober = None
     
-    async def health_check(self) -> bool:
+    async def health_check(self, base_url: Optional[str] = None) -> bool:
         """Check if Ollama service is running and configured model is available."""
+        base_url = base_url or self.base_url
         try:
-            response = await self.client.get(f"{self.base_url}/api/tags", timeout=5)
+            response = await self.client.get(f"{base_url}/api/tags", timeout=5)
             response.raise_for_status() 
             models_response = response.json()
             models = models_response.get("models", [])
             return any(self.model in m['name'] for m in models) 
 
         except httpx.RequestError as e:
-            logger.error(f"Ollama health check failed due to request error: {e}")
+            logger.error(f"Ollama health check for {base_url} failed due to request error: {e}")
             return False
         except json.JSONDecodeError:
             logger.error(f"Ollama health check received invalid JSON response.")
@@ -32,61 +181,178 @@ class OllamaService:
             logger.error(f"Unexpected error during Ollama health check: {str(e)}")
             return False
 
-    async def chat_stream(self, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+    def _payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": True, 
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+            }
+        }
+
+    @staticmethod
+    def prompt_fingerprint(payload: Dict[str, Any]) -> str:
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    def generation_key(self, messages: List[Dict[str, str]], coalesce_key: Optional[str] = None) -> str:
+        """The key ``chat_stream`` coalesces these arguments under."""
+        return coalesce_key or self.prompt_fingerprint(self._payload(messages))
+
+    def is_generating(self, key: str) -> bool:
+        """Whether a ``chat_stream`` call with ``key`` would join a running generation."""
+        flight = self._in_flight.get(key)
+        return flight is not None and not flight.done
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        coalesce_key: Optional[str] = None,
+        affinity_key: Optional[str] = None,
+        stats: Optional[GenerationStats] = None,
+    ) -> AsyncGenerator[str, None]:
         """
         Send a chat request to Ollama and stream the response.
+
+        Concurrent calls with the same prompt share a single upstream generation:
+        the first caller starts it and every caller, including ones that join
+        mid-stream, receives the full chunk sequence through its own queue. The
+        upstream request is cancelled once its last subscriber goes away.
         
         Args:
             messages: A list of message dictionaries (e.g., [{"role": "user", "content": "hello"}])
                       This will include system messages and conversation history.
+            coalesce_key: Overrides the prompt fingerprint when the caller knows two
+                      different prompts deserve the same answer. Every caller
+                      with the key receives the first caller's reply, so the
+                      prompt must hold nothing specific to one user.
+            affinity_key: Keeps requests with the same key (a chat session) on the
+                      same backend while it stays healthy.
+            stats:    Filled in from Ollama's final frame once the stream has ended.
         Yields:
             str: Chunks of the AI's response text.
         """
-        url = f"{self.base_url}/api/chat"
-        headers = {"Content-Type": "application/json"}
+        payload = self._payload(messages)
+        key = self.generation_key(messages, coalesce_key)
 
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "stream": True, 
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-            }
-        }
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = _InFlightGeneration()
+            self._in_flight[key] = flight
+            flight.task = asyncio.create_task(self._run_generation(key, flight, payload, affinity_key))
+        else:
+            self.coalesced_requests += 1
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in flight.chunks:
+            queue.put_nowait(chunk)
+        flight.subscribers.append(queue)
         try:
-            async with self.client.stream("POST", url, headers=headers, json=payload, timeout=settings.OLLAMA_TIMEOUT) as response:
-                response.raise_for_status()
-
-                buffer = ""
-                async for chunk in response.aiter_bytes():
-                    buffer += chunk.decode("utf-8")
-                    
-                    while "\n" in buffer:
-                        line, buffer = buffer.split("\n", 1)
-                        if line.strip():
-                            try:
-                                json_data = json.loads(line)
-                                content_chunk = json_data.get("message", {}).get("content", "")
-                                if content_chunk:
-                                    yield content_chunk
-                                    
-                                if json_data.get("done"):
-                                    return 
-                                    
-                            except json.JSONDecodeError:
-                                logger.warning(f"Failed to decode JSON from Ollama stream: {line.strip()}")
-                            except Exception as parse_error:
-                                logger.error(f"Error processing stream chunk: {parse_error} in line: {line.strip()}")
-        
-        except httpx.TimeoutException:
-            logger.error("Ollama streaming request timed out.")
-            yield "ERROR: AI service timed out. Please try again."
-        except httpx.RequestError as e:
-            logger.error(f"Ollama streaming request failed: {e}")
-            yield f"ERROR: Could not connect to AI service: {e}"
-        except Exception as e:
-            logger.error(f"Unexpected error during Ollama streaming: {str(e)}")
-            yield f"ERROR: An unexpected error occurred: {str(e)}"
+            while True:
+                chunk = await queue.get()
+                if chunk is _END_OF_STREAM:
+                    if stats is not None:
+                        flight.stats.copy_to(stats)
+                    return
+                yield chunk
+        finally:
+            flight.subscribers.remove(queue)
+            if not flight.subscribers and not flight.done:
+                # Nobody is listening any more: free the Ollama slot, and make
+                # sure a new caller starts a fresh generation instead of joining.
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                flight.task.cancel()
+
+    async def _run_generation(
+        self, key: str, flight: _InFlightGeneration, payload: Dict[str, Any], affinity_key: Optional[str]
+    ) -> None:
+        def publish(chunk: str) -> None:
+            flight.chunks.append(chunk)
+            for queue in flight.subscribers:
+                queue.put_nowait(chunk)
+
+        tried: List[OllamaBackend] = []
+        error = None
+        try:
+            while True:
+                backend = self.pool.acquire(affinity_key, exclude=tried)
+                if backend is None:
+                    publish(error or "ERROR: AI service is currently unavailable. Please try again later.")
+                    return
+                tried.append(backend)
+                try:
+                    async for chunk in self._stream_upstream(backend, payload, flight.stats):
+                        publish(chunk)
+                    return
+                except httpx.TimeoutException:
+                    logger.error(f"Ollama streaming request to {backend.base_url} timed out.")
+                    error = "ERROR: AI service timed out. Please try again."
+                except httpx.RequestError as e:
+                    logger.error(f"Ollama streaming request to {backend.base_url} failed: {e}")
+                    error = f"ERROR: Could not connect to AI service: {e}"
+                except httpx.HTTPStatusError as e:
+                    logger.error(f"Ollama at {backend.base_url} answered {e.response.status_code}")
+                    error = f"ERROR: AI service returned an error: {e.response.status_code}"
+                except Exception as e:
+                    logger.error(f"Unexpected error during Ollama streaming: {str(e)}")
+                    error = f"ERROR: An unexpected error occurred: {str(e)}"
+                finally:
+                    self.pool.release(backend)
+
+                backend.breaker.record_failure()
+                # Nothing has reached the client yet, so another backend can
+                # still answer; a stream that broke halfway can't be resumed.
+                if flight.chunks:
+                    publish(error)
+                    return
+        except asyncio.CancelledError:
+            logger.info("Ollama generation cancelled: no subscribers left")
+        finally:
+            flight.done = True
+            if self._in_flight.get(key) is flight:
+                del self._in_flight[key]
+            for queue in flight.subscribers:
+                queue.put_nowait(_END_OF_STREAM)
+
+    async def _stream_upstream(
+        self, backend: OllamaBackend, payload: Dict[str, Any], stats: Optional[GenerationStats] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream one /api/chat generation from one backend. Transport errors propagate to the caller.
+
+        The counts and durations in Ollama's final frame are recorded as metrics
+        and, when given, copied into ``stats``.
+        """
+        url = f"{backend.base_url}/api/chat"
+        headers = {"Content-Type": "application/json"}
+
+        started = time.monotonic()
+        first_token = True
+        async with self.client.stream("POST", url, headers=headers, json=payload, timeout=settings.OLLAMA_TIMEOUT) as response:
+            response.raise_for_status()
+            backend.breaker.record_success()
+
+            async for json_data in aiter_ndjson(response.aiter_bytes()):
+                try:
+                    content_chunk = json_data.get("message", {}).get("content", "")
+                    if content_chunk:
+                        if first_token:
+                            backend.record_latency(time.monotonic() - started)
+                            first_token = False
+                        yield content_chunk
+
+                    if json_data.get("done"):
+                        frame_stats = GenerationStats.from_frame(json_data, backend.base_url)
+                        frame_stats.observe()
+                        if stats is not None:
+                            frame_stats.copy_to(stats)
+                        return
+
+                except Exception as parse_error:
+                    logger.error(f"Error processing stream chunk: {parse_error} in frame: {json_data}")
 
 ollama_service = OllamaService()
\ No newline at end of file
@@ -1,10 +1,21 @@
-from sqlalchemy.orm import Session
+import logging
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 from uuid import UUID, uuid4
 
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import timed_db
 from app.models.chat_message import ChatMessage
+from app.models.enums import ChatMessageStatus
+from app.services.chat_persistence_queue import chat_persistence_queue
+from app.services.conversation_cache import conversation_cache
 from app.schemas.chat import ChatMessageBase  
 
+logger = logging.getLogger(__name__)
+
 # Define a Pydantic schema for storing/retrieving chat messages
 # app/schemas/chat.py
 # class ChatMessageBase(BaseModel):
@@ -13,8 +24,9 @@ from app.schemas.chat import ChatMessageBase
 #     content: str
 #     timestamp: datetime # for retrieved messages
 
+@timed_db("create_message")
 async def create_chat_message(
-    db: Session, user_id: int, session_id: UUID, role: str, content: str
+    db: AsyncSession, user_id: int, session_id: UUID, role: str, content: str
 ) -> ChatMessage:
     """Saves a new chat message to the database."""
     db_message = ChatMessage(
@@ -24,41 +36,251 @@ async def create_chat_message(
         content=content
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.commit()
+    await db.refresh(db_message)
+    await conversation_cache.append(user_id, session_id, {"role": role, "content": content})
     return db_message
 
+def _as_utc(timestamp: datetime) -> datetime:
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+async def queue_chat_message(user_id: int, session_id: UUID, role: str, content: str) -> None:
+    """Hands a chat message to the write-behind queue; it is persisted in the next batch."""
+    chat_persistence_queue.enqueue(user_id, session_id, role, content)
+    await conversation_cache.append(user_id, session_id, {"role": role, "content": content})
+
+@timed_db("start_reply")
+async def start_ai_reply(user_id: int, session_id: UUID) -> int:
+    """
+    Insert an empty ``streaming`` AI message and return its id.
+
+    Streamed replies are written through their own short sessions: the request's
+    session is already closed by the time the response body is being generated.
+    """
+    async with AsyncSessionLocal() as db:
+        db_message = ChatMessage(
+            user_id=user_id,
+            session_id=session_id,
+            role="ai",
+            content="",
+            timestamp=datetime.now(timezone.utc),
+            status=ChatMessageStatus.STREAMING.value,
+        )
+        db.add(db_message)
+        await db.commit()
+        return db_message.id
+
+@timed_db("reopen_reply")
+async def reopen_ai_reply(message_id: int) -> None:
+    """Mark an interrupted reply as ``streaming`` again, so that checkpoints of its continuation are saved."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(ChatMessage)
+            .where(ChatMessage.id == message_id)
+            .values(status=ChatMessageStatus.STREAMING.value)
+        )
+        await db.commit()
+
+@timed_db("checkpoint_reply")
+async def checkpoint_ai_reply(message_id: int, content: str) -> None:
+    """Save the reply text produced so far. A no-op once the reply has been finished."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(ChatMessage)
+            .where(
+                ChatMessage.id == message_id,
+                ChatMessage.status == ChatMessageStatus.STREAMING.value
+            )
+            .values(content=content)
+        )
+        await db.commit()
+
+@timed_db("finish_reply")
+async def finish_ai_reply(
+    user_id: int, session_id: UUID, message_id: int, content: str,
+    status: ChatMessageStatus, continued: bool = False
+) -> None:
+    """
+    Store the final text and status of a checkpointed reply.
+
+    A reply aborted before producing any text is deleted rather than left as an
+    empty message in the history.
+    """
+    async with AsyncSessionLocal() as db:
+        if content:
+            await db.execute(
+                update(ChatMessage)
+                .where(ChatMessage.id == message_id)
+                .values(content=content, status=status.value)
+            )
+        else:
+            await db.execute(delete(ChatMessage).where(ChatMessage.id == message_id))
+        await db.commit()
+
+    if continued:
+        # The cached window already holds the earlier partial text of this reply.
+        await conversation_cache.invalidate(user_id, session_id)
+    elif content:
+        await conversation_cache.append(user_id, session_id, {"role": "ai", "content": content})
+
+def _stale_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.CHAT_STREAMING_STALE_AFTER)
+
+@timed_db("abort_stale_replies")
+async def abort_stale_replies(user_id: Optional[int] = None, session_id: Optional[UUID] = None) -> int:
+    """
+    Mark replies left ``streaming`` for longer than ``CHAT_STREAMING_STALE_AFTER``
+    as ``aborted``, so they show up in the history and can be continued.
+
+    Such rows belong to a worker that died mid-reply. Empty ones are deleted,
+    as ``finish_ai_reply`` would have done. Returns the number of rows changed.
+    """
+    stale = [
+        ChatMessage.status == ChatMessageStatus.STREAMING.value,
+        ChatMessage.timestamp < _stale_cutoff(),
+    ]
+    if user_id is not None:
+        stale += [ChatMessage.user_id == user_id, ChatMessage.session_id == session_id]
+    async with AsyncSessionLocal() as db:
+        deleted = await db.execute(
+            delete(ChatMessage)
+            .where(*stale, ChatMessage.content == "")
+            .returning(ChatMessage.user_id, ChatMessage.session_id)
+        )
+        sessions = set(deleted.all())
+        aborted = await db.execute(
+            update(ChatMessage)
+            .where(*stale)
+            .values(status=ChatMessageStatus.ABORTED.value)
+            .returning(ChatMessage.user_id, ChatMessage.session_id)
+            .execution_options(synchronize_session=False)
+        )
+        rows = aborted.all()
+        sessions.update(rows)
+        await db.commit()
+    # Cached windows were built without these replies.
+    for stale_user_id, stale_session_id in sessions:
+        await conversation_cache.invalidate(stale_user_id, stale_session_id)
+    if rows:
+        logger.info(f"Marked {len(rows)} stale streaming replies as aborted")
+    return len(rows)
+
+@timed_db("last_message")
+async def get_last_message(db: AsyncSession, user_id: int, session_id: UUID) -> Optional[ChatMessage]:
+    """
+    The newest message of a session with its status, including messages still
+    in the write-behind queue (returned as unsaved ``ChatMessage`` objects).
+    A reply stuck in ``streaming`` past the staleness timeout is aborted first.
+    """
+    pending = chat_persistence_queue.pending_for(user_id, session_id)
+    newest = (
+        select(ChatMessage)
+        .where(
+            ChatMessage.user_id == user_id,
+            ChatMessage.session_id == session_id
+        )
+        .order_by(ChatMessage.timestamp.desc())
+        .limit(1)
+    )
+    latest = await db.scalar(newest)
+    if (
+        latest is not None
+        and latest.status == ChatMessageStatus.STREAMING.value
+        and _as_utc(latest.timestamp) < _stale_cutoff()
+    ):
+        await abort_stale_replies(user_id, session_id)
+        latest = await db.scalar(newest.execution_options(populate_existing=True))
+    if pending and (latest is None or pending[-1].timestamp > _as_utc(latest.timestamp)):
+        m = pending[-1]
+        return ChatMessage(
+            user_id=m.user_id, session_id=m.session_id, role=m.role, content=m.content,
+            timestamp=m.timestamp, status=ChatMessageStatus.COMPLETE.value,
+        )
+    return latest
+
+@timed_db("history")
 async def get_chat_history(
-    db: Session, user_id: int, session_id: UUID, limit: int = 100
+    db: AsyncSession, user_id: int, session_id: UUID, limit: int = 100
 ) -> List[Dict[str, str]]:
     """
-    Retrieves the last N messages for a given user and session,
-    formatted for the AI model (role, content).
+    Retrieves the most recent N messages for a given user and session,
+    oldest first, formatted for the AI model (role, content).
+    Messages still waiting in the write-behind queue are included; replies
+    that are still streaming are not, unless they have gone stale.
     """
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.user_id == user_id,
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.timestamp.asc()).limit(limit).all()
+    window_size = conversation_cache.window_size
+    if limit <= window_size:
+        cached = await conversation_cache.get(user_id, session_id)
+        if cached is not None:
+            return cached[-limit:]
+
+    # Snapshot pending messages on both sides of the query: a batch committed
+    # while we wait shows up in the query result and is de-duplicated by
+    # (timestamp, role) below, and one queued meanwhile is still picked up.
+    pending = chat_persistence_queue.pending_for(user_id, session_id)
+
+    result = await db.execute(
+        select(ChatMessage.role, ChatMessage.content, ChatMessage.timestamp)
+        .where(
+            ChatMessage.user_id == user_id,
+            ChatMessage.session_id == session_id,
+            or_(
+                ChatMessage.status != ChatMessageStatus.STREAMING.value,
+                and_(ChatMessage.timestamp < _stale_cutoff(), ChatMessage.content != ""),
+            )
+        )
+        .order_by(ChatMessage.timestamp.desc())
+        .limit(limit)
+    )
+    rows = [(_as_utc(timestamp), role, content) for role, content, timestamp in result.all()]
+    rows.reverse()
+
+    pending_ids = {id(m) for m in pending}
+    pending.extend(
+        m for m in chat_persistence_queue.pending_for(user_id, session_id)
+        if id(m) not in pending_ids
+    )
+    if pending:
+        persisted = {(timestamp, role) for timestamp, role, _ in rows}
+        rows.extend(
+            (m.timestamp, m.role, m.content)
+            for m in pending
+            if (m.timestamp, m.role) not in persisted
+        )
+        rows.sort(key=lambda row: row[0])
+        rows = rows[-limit:]
 
     formatted_messages = [
-        {"role": msg.role, "content": msg.content}
-        for msg in messages
+        {"role": role, "content": content}
+        for _, role, content in rows
     ]
+    if limit >= window_size:
+        await conversation_cache.set(user_id, session_id, formatted_messages)
     return formatted_messages
 
+@timed_db("session_lookup")
 async def get_or_create_session_id(
-    db: Session, user_id: int, provided_session_id: Optional[UUID] = None
+    db: AsyncSession, user_id: int, provided_session_id: Optional[UUID] = None
 ) -> UUID:
     """
     Gets the latest session ID for a user, or creates a new one if none provided
     or no history exists for the provided ID.
     """
     if provided_session_id:
-        existing_session = db.query(ChatMessage).filter(
-            ChatMessage.user_id == user_id,
-            ChatMessage.session_id == provided_session_id
-        ).first()
+        if chat_persistence_queue.has_pending(user_id, provided_session_id):
+            return provided_session_id
+        if await conversation_cache.get(user_id, provided_session_id):
+            return provided_session_id
+
+        existing_session = await db.scalar(
+            select(ChatMessage.id)
+            .where(
+                ChatMessage.user_id == user_id,
+                ChatMessage.session_id == provided_session_id
+            )
+            .limit(1)
+        )
         if existing_session:
             return provided_session_id
 
-    return uuid4()
\ No newline at end of file
+    return uuid4()
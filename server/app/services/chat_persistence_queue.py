@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.chat_message import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Errors caused by a row itself, which retrying can't fix.
+_ROW_ERRORS = (IntegrityError, DataError)
+
+
+class PendingChatMessage:
+    """A chat message accepted by the queue but not yet committed to Postgres."""
+
+    __slots__ = ("user_id", "session_id", "role", "content", "timestamp")
+
+    def __init__(self, user_id: int, session_id: UUID, role: str, content: str):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.role = role
+        self.content = content
+        # Stamped client-side so queued and persisted rows order identically.
+        self.timestamp = datetime.now(timezone.utc)
+
+    def as_row(self) -> Dict:
+        return {
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp,
+        }
+
+
+class ChatPersistenceQueue:
+    """
+    Write-behind buffer for ``ChatMessage`` rows.
+
+    Messages are collected in memory and written with one multi-row INSERT when
+    ``max_batch`` messages are waiting or every ``flush_interval`` seconds,
+    whichever comes first. Unflushed messages stay visible through
+    ``pending_for`` so readers of a session always see their own writes.
+
+    When a batch fails its rows are retried one at a time, and rows the
+    database rejects (say, for a user deleted meanwhile) are dropped so they
+    can't hold up everybody else's. If the database itself is unreachable the
+    queue keeps its rows and retries with exponential backoff up to
+    ``max_backoff`` seconds; once ``max_pending`` messages are waiting, new
+    ones are dropped. Dropped messages are counted in
+    ``chat_messages_dropped_total``.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        max_batch: int = 100,
+        flush_interval: float = 0.5,
+        max_pending: int = 10000,
+        max_backoff: float = 30.0,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._pending: List[PendingChatMessage] = []
+        self._by_session: Dict[UUID, List[PendingChatMessage]] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, user_id: int, session_id: UUID, role: str, content: str) -> PendingChatMessage:
+        message = PendingChatMessage(user_id, session_id, role, content)
+        if len(self._pending) >= self.max_pending:
+            metrics.CHAT_MESSAGES_DROPPED.inc(reason="queue_full")
+            logger.error(f"Chat persistence queue is full, dropping a message for session {session_id}")
+            return message
+        self._pending.append(message)
+        self._by_session.setdefault(session_id, []).append(message)
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        return message
+
+    def pending_for(self, user_id: int, session_id: UUID) -> List[PendingChatMessage]:
+        return [m for m in self._by_session.get(session_id, ()) if m.user_id == user_id]
+
+    def has_pending(self, user_id: int, session_id: UUID) -> bool:
+        return any(m.user_id == user_id for m in self._by_session.get(session_id, ()))
+
+    async def flush(self) -> int:
+        """Write everything queued so far in one transaction. Returns the number of rows written."""
+        async with self._flush_lock:
+            batch = self._pending[:]
+            if not batch:
+                return 0
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                logger.warning(f"Failed to flush {len(batch)} chat messages, retrying them one by one: {e}")
+                return await self._flush_one_by_one(batch)
+            self._discard(len(batch))
+            self._failures = 0
+            return len(batch)
+
+    async def _insert(self, messages: List[PendingChatMessage]) -> None:
+        async with self.session_factory() as db:
+            await db.execute(insert(ChatMessage), [m.as_row() for m in messages])
+            await db.commit()
+
+    async def _flush_one_by_one(self, batch: List[PendingChatMessage]) -> int:
+        written = 0
+        for handled, message in enumerate(batch):
+            try:
+                await self._insert([message])
+                written += 1
+            except _ROW_ERRORS as e:
+                metrics.CHAT_MESSAGES_DROPPED.inc(reason="rejected")
+                logger.error(f"Dropping chat message for session {message.session_id} rejected by the database: {e}")
+            except Exception as e:
+                self._discard(handled)
+                self._failures += 1
+                delay = min(self.flush_interval * 2 ** self._failures, self.max_backoff)
+                self._retry_at = time.monotonic() + delay
+                logger.error(
+                    f"Failed to persist chat messages, {len(self._pending)} queued, retrying in {delay:.1f}s: {e}"
+                )
+                return written
+        self._discard(len(batch))
+        self._failures = 0
+        return written
+
+    def _discard(self, count: int) -> None:
+        """Forget the first ``count`` queued messages, once written or dropped."""
+        # enqueue only appends, so they are a prefix of the queue and, per
+        # session, a prefix of that session's list.
+        handled = self._pending[:count]
+        del self._pending[:count]
+        handled_per_session: Dict[UUID, int] = {}
+        for message in handled:
+            handled_per_session[message.session_id] = handled_per_session.get(message.session_id, 0) + 1
+        for session_id, session_count in handled_per_session.items():
+            remaining = self._by_session[session_id][session_count:]
+            if remaining:
+                self._by_session[session_id] = remaining
+            else:
+                del self._by_session[session_id]
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # A full batch wakes the loop early, but not before a retry is due.
+            if self._stopping or time.monotonic() >= self._retry_at:
+                await self.flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flusher and write out anything still queued."""
+        if self._task is not None:
+            # Let an in-progress flush finish rather than cancelling it mid-commit.
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._pending:
+            logger.error(f"{len(self._pending)} chat messages could not be persisted at shutdown")
+
+
+chat_persistence_queue = ChatPersistenceQueue(
+    max_batch=settings.CHAT_FLUSH_MAX_BATCH,
+    flush_interval=settings.CHAT_FLUSH_INTERVAL,
+    max_pending=settings.CHAT_FLUSH_MAX_PENDING,
+    max_backoff=settings.CHAT_FLUSH_MAX_BACKOFF,
+)
@@ -0,0 +1,166 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+# Fixed cost Ollama's chat template adds around every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local stand-in for the model tokenizer.
+
+    Mistral's SentencePiece vocabulary averages a little over one token per
+    word-or-punctuation piece on English advising text and about four
+    characters per token on code-like text; taking the larger of the two keeps
+    the estimate on the safe side without loading a tokenizer.
+    """
+    if not text:
+        return 0
+    return max(len(_WORD_RE.findall(text)) * 13 // 10, len(text) // 4)
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _fingerprint(message: Dict[str, str]) -> str:
+    return hashlib.sha1(f"{message['role']}\0{message['content']}".encode("utf-8")).hexdigest()
+
+
+def _first_sentence(text: str, max_chars: int = 160) -> str:
+    text = " ".join(text.split())
+    sentence = _SENTENCE_END_RE.split(text, 1)[0]
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rsplit(" ", 1)[0] + "..."
+    return sentence
+
+
+class RollingSummary:
+    """One ``(fingerprint, line)`` entry per folded message, oldest first."""
+
+    __slots__ = ("entries",)
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str]] = []
+
+    @property
+    def lines(self) -> List[str]:
+        return [line for _, line in self.entries]
+
+
+def _contains_run(sequence: List[str], run: List[str]) -> bool:
+    if not run:
+        return True
+    return any(sequence[i:i + len(run)] == run for i in range(len(sequence) - len(run) + 1))
+
+
+def _summary_line(message: Dict[str, str]) -> str:
+    speaker = "Student asked" if message["role"] == "user" else "Advisor answered"
+    return f"- {speaker}: {_first_sentence(message['content'])}"
+
+
+class ConversationContextBuilder:
+    """
+    Builds the message list sent to Ollama for one chat turn.
+
+    The newest turns are kept verbatim for as long as they fit in
+    ``token_budget``. Anything older is folded into a short extractive summary
+    that is cached per ``session_id``, so it never costs an extra model call.
+
+    ``history`` is only a window of the conversation, so the summary is kept in
+    two parts: lines for messages that have slid out of the window, which only
+    the cache remembers, and lines for the folded part of the current window,
+    rebuilt on every call. The split point may move either way between turns
+    (a long question followed by a short one) without a message ever being
+    summarized twice or appearing both in the summary and verbatim.
+    """
+
+    def __init__(self, token_budget: int, summary_token_budget: int, max_sessions: int = 2048):
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_sessions = max_sessions
+        self._summaries: "OrderedDict[UUID, RollingSummary]" = OrderedDict()
+
+    def build(
+        self, system_prompt: str, history: List[Dict[str, str]], session_id: UUID
+    ) -> List[Dict[str, str]]:
+        """``history`` is oldest first and ends with the message being answered."""
+        budget = self.token_budget - estimate_tokens(system_prompt) - MESSAGE_OVERHEAD_TOKENS
+        recent, folded = self._split(history, budget)
+
+        messages = [{"role": "system", "content": system_prompt}]
+        summary = self._summarize(session_id, history, len(folded))
+        if summary:
+            messages.append({"role": "system", "content": summary})
+        messages.extend(recent)
+        return messages
+
+    def _split(
+        self, history: List[Dict[str, str]], budget: int
+    ) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """Keep the longest suffix of ``history`` that fits; always keep the latest message."""
+        budget -= self.summary_token_budget
+        used = 0
+        start = len(history)
+        while start > 0:
+            cost = message_tokens(history[start - 1])
+            if used + cost > budget and start < len(history):
+                break
+            used += cost
+            start -= 1
+        return history[start:], history[:start]
+
+    def _summarize(self, session_id: UUID, history: List[Dict[str, str]], folded_count: int) -> Optional[str]:
+        summary = self._summaries.get(session_id)
+        if summary is None:
+            if not folded_count:
+                return None
+            summary = RollingSummary()
+            self._summaries[session_id] = summary
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_sessions:
+            self._summaries.popitem(last=False)
+
+        # Entries whose messages are still in the window are dropped and
+        # rebuilt from the window below; the rest came before it. Matching the
+        # longest run of entries, not a single message, keeps repeated
+        # messages such as "ok" from being placed wrongly.
+        fingerprints = [_fingerprint(m) for m in history]
+        cached = [fingerprint for fingerprint, _ in summary.entries]
+        archived = len(cached)
+        while archived > 0 and _contains_run(fingerprints, cached[archived - 1:]):
+            archived -= 1
+
+        summary.entries[archived:] = [
+            (fingerprint, _summary_line(message))
+            for fingerprint, message in zip(fingerprints[:folded_count], history[:folded_count])
+        ]
+
+        # Oldest points fall off first once the summary outgrows its budget.
+        while len(summary.entries) > 1 and estimate_tokens("\n".join(summary.lines)) > self.summary_token_budget:
+            summary.entries.pop(0)
+
+        return self._render(summary)
+
+    @staticmethod
+    def _render(summary: Optional[RollingSummary]) -> Optional[str]:
+        if summary is None or not summary.lines:
+            return None
+        return "Summary of the earlier conversation:\n" + "\n".join(summary.lines)
+
+    def forget(self, session_id: UUID) -> None:
+        self._summaries.pop(session_id, None)
+
+
+context_builder = ConversationContextBuilder(
+    token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET,
+    summary_token_budget=settings.CHAT_SUMMARY_TOKEN_BUDGET,
+)
@@ -0,0 +1,139 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+
+
+class MemoryConversationCache:
+    """
+    Per-process LRU of recent conversation windows with a TTL.
+
+    A window holds the newest ``window_size`` messages of one
+    ``(user_id, session_id)`` conversation, oldest first. Messages written
+    through another worker never reach it, so it is only used when the app
+    runs as a single process.
+    """
+
+    def __init__(self, window_size: int, ttl: float, max_sessions: int = 4096):
+        self.window_size = window_size
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._windows: "OrderedDict[Tuple[int, UUID], Tuple[float, List[Message]]]" = OrderedDict()
+
+    async def get(self, user_id: int, session_id: UUID) -> Optional[List[Message]]:
+        key = (user_id, session_id)
+        entry = self._windows.get(key)
+        if entry is None:
+            return None
+        expires_at, window = entry
+        if time.monotonic() > expires_at:
+            del self._windows[key]
+            return None
+        self._windows.move_to_end(key)
+        return list(window)
+
+    async def set(self, user_id: int, session_id: UUID, messages: List[Message]) -> None:
+        key = (user_id, session_id)
+        self._windows[key] = (time.monotonic() + self.ttl, list(messages[-self.window_size:]))
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_sessions:
+            self._windows.popitem(last=False)
+
+    async def append(self, user_id: int, session_id: UUID, message: Message) -> None:
+        """Extend a cached window in place; a cold session stays cold."""
+        key = (user_id, session_id)
+        entry = self._windows.get(key)
+        if entry is None:
+            return
+        _, window = entry
+        window.append(message)
+        del window[:-self.window_size]
+        self._windows[key] = (time.monotonic() + self.ttl, window)
+        self._windows.move_to_end(key)
+
+    async def invalidate(self, user_id: int, session_id: UUID) -> None:
+        self._windows.pop((user_id, session_id), None)
+
+
+class RedisConversationCache:
+    """
+    Shared conversation windows in Redis so every worker sees the same cache.
+
+    Each window is a Redis list of JSON messages trimmed to ``window_size``
+    and expired by Redis after ``ttl`` seconds of inactivity.
+    """
+
+    def __init__(self, redis_url: str, window_size: int, ttl: float):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        self.window_size = window_size
+        self.ttl = int(ttl)
+
+    @staticmethod
+    def _key(user_id: int, session_id: UUID) -> str:
+        return f"chat:window:{user_id}:{session_id}"
+
+    async def get(self, user_id: int, session_id: UUID) -> Optional[List[Message]]:
+        try:
+            raw = await self.redis.lrange(self._key(user_id, session_id), 0, -1)
+        except Exception as e:
+            logger.warning(f"Conversation cache read failed: {e}")
+            return None
+        if not raw:
+            return None
+        return [json.loads(item) for item in raw]
+
+    async def set(self, user_id: int, session_id: UUID, messages: List[Message]) -> None:
+        key = self._key(user_id, session_id)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if messages:
+                    pipe.rpush(key, *(json.dumps(m) for m in messages[-self.window_size:]))
+                    pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Conversation cache write failed: {e}")
+
+    async def append(self, user_id: int, session_id: UUID, message: Message) -> None:
+        key = self._key(user_id, session_id)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                # RPUSHX only appends to a window that is already cached.
+                pipe.rpushx(key, json.dumps(message))
+                pipe.ltrim(key, -self.window_size, -1)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Conversation cache append failed: {e}")
+
+    async def invalidate(self, user_id: int, session_id: UUID) -> None:
+        try:
+            await self.redis.delete(self._key(user_id, session_id))
+        except Exception as e:
+            logger.warning(f"Conversation cache invalidate failed: {e}")
+
+
+def create_conversation_cache():
+    if settings.CHAT_CACHE_BACKEND == "redis" or settings.WEB_CONCURRENCY > 1:
+        if settings.CHAT_CACHE_BACKEND != "redis":
+            logger.warning(
+                f"Using the redis conversation cache with {settings.WEB_CONCURRENCY} workers: "
+                f"a per-process cache would miss turns written through other workers"
+            )
+        return RedisConversationCache(
+            settings.REDIS_URL, settings.CHAT_HISTORY_LIMIT, settings.CHAT_CACHE_TTL
+        )
+    return MemoryConversationCache(settings.CHAT_HISTORY_LIMIT, settings.CHAT_CACHE_TTL)
+
+
+conversation_cache = create_conversation_cache()
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.services.prerequisite_graph import CatalogCourse, PrerequisiteGraph, prerequisite_graph_index
+from app.services.context_builder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z]+|\d+")
+_COURSE_CODE_RE = re.compile(r"\b([a-z]{2,5})\s*-?\s*(\d{3})\b")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in is it its me my "
+    "of on or should so take that the their them then there these this to was what "
+    "when where which who will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word and number tokens without stopwords.
+
+    Course codes also produce a joined token (``"CMPS 161"`` -> ``cmps161``) so an
+    exact code in a question outranks every course that merely shares the subject.
+    """
+    text = text.lower()
+    tokens = [t for t in _TOKEN_RE.findall(text) if t not in _STOPWORDS]
+    tokens.extend(subject + number for subject, number in _COURSE_CODE_RE.findall(text))
+    return tokens
+
+
+def _enum_text(value) -> str:
+    value = getattr(value, "value", value)
+    return str(value).replace("_", " ") if value is not None else ""
+
+
+def course_document(graph: PrerequisiteGraph, course: CatalogCourse) -> str:
+    """Text indexed for one course: catalog fields plus its prerequisite edges in both directions."""
+    prerequisites = [graph.courses[i].course_code for i in sorted(graph.prerequisites_of(course.id)) if i in graph.courses]
+    dependents = [graph.courses[i].course_code for i in graph.dependents.get(course.id, ()) if i in graph.courses]
+    parts = [
+        course.course_code,
+        course.title,
+        course.description or "",
+        _enum_text(course.category),
+        _enum_text(course.level),
+    ]
+    if prerequisites:
+        parts.append("prerequisites " + " ".join(prerequisites))
+    if dependents:
+        parts.append("required for " + " ".join(dependents))
+    return "\n".join(parts)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a small, static document set.
+
+    Postings are kept as ``term -> [(doc, term frequency), ...]`` so a query only
+    touches the documents that contain one of its terms.
+    """
+
+    def __init__(
+        self,
+        doc_ids: Sequence[int],
+        doc_lengths: Sequence[int],
+        postings: Dict[str, List[Tuple[int, int]]],
+        fingerprint: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.doc_ids = list(doc_ids)
+        self.doc_lengths = list(doc_lengths)
+        self.postings = postings
+        self.fingerprint = fingerprint
+        self.k1 = k1
+        self.b = b
+        n = len(self.doc_ids)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, documents: Dict[int, str], fingerprint: str) -> "BM25Index":
+        doc_ids = sorted(documents)
+        doc_lengths = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, doc_id in enumerate(doc_ids):
+            tokens = tokenize(documents[doc_id])
+            doc_lengths.append(len(tokens))
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+        return cls(doc_ids, doc_lengths, postings, fingerprint)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top ``k`` ``(doc_id, score)`` pairs for ``query``, best first."""
+        scores: Dict[int, float] = {}
+        k1, b, avg_length = self.k1, self.b, self.avg_length or 1.0
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc, tf in docs:
+                norm = k1 * (1 - b + b * self.doc_lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(self.doc_ids[doc], score) for doc, score in best]
+
+    def to_dict(self) -> Dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        postings = {term: [tuple(p) for p in docs] for term, docs in data["postings"].items()}
+        return cls(data["doc_ids"], data["doc_lengths"], postings, data["fingerprint"], data["k1"], data["b"])
+
+
+class CourseRetriever:
+    """
+    Retrieves catalog courses relevant to a chat message.
+
+    The BM25 index is derived from the shared ``PrerequisiteGraph`` and rebuilt
+    when the graph version changes. It is also written to ``index_path`` keyed by
+    a fingerprint of the indexed text, so a restart against an unchanged catalog
+    loads the postings instead of re-tokenizing every course.
+    """
+
+    def __init__(self, index_path: Optional[str], top_k: int, token_budget: int):
+        self.index_path = index_path
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self._index: Optional[BM25Index] = None
+        self._graph: Optional[PrerequisiteGraph] = None
+
+    def _index_for(self, graph: PrerequisiteGraph) -> BM25Index:
+        if self._graph is graph and self._index is not None:
+            return self._index
+        with self._lock:
+            if self._graph is graph and self._index is not None:
+                return self._index
+            documents = {course_id: course_document(graph, c) for course_id, c in graph.courses.items()}
+            fingerprint = hashlib.sha256(
+                json.dumps(sorted(documents.items())).encode("utf-8")
+            ).hexdigest()
+            index = self._load(fingerprint)
+            if index is None:
+                index = BM25Index.build(documents, fingerprint)
+                self._save(index)
+                logger.info("Built course retrieval index: %s courses, %s terms", len(documents), len(index.postings))
+            self._index, self._graph = index, graph
+            return index
+
+    def _load(self, fingerprint: str) -> Optional[BM25Index]:
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("fingerprint") != fingerprint:
+                return None
+            return BM25Index.from_dict(data)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable course index {self.index_path}: {e}")
+            return None
+
+    def _save(self, index: BM25Index) -> None:
+        if not self.index_path:
+            return
+        try:
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index.to_dict(), f, separators=(",", ":"))
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not persist course index to {self.index_path}: {e}")
+
+    def retrieve(self, graph: PrerequisiteGraph, query: str, k: Optional[int] = None) -> List[CatalogCourse]:
+        hits = self._index_for(graph).search(query, k or self.top_k)
+        return [graph.courses[course_id] for course_id, _ in hits if course_id in graph.courses]
+
+    def format_context(self, graph: PrerequisiteGraph, courses: List[CatalogCourse]) -> Optional[str]:
+        """Render retrieved courses as prompt text, dropping the lowest-ranked ones past ``token_budget``."""
+        header = "Relevant SELU catalog entries (use these for course facts):"
+        lines = [header]
+        used = estimate_tokens(header)
+        for course in courses:
+            prerequisites = sorted(
+                graph.courses[i].course_code for i in graph.prerequisites_of(course.id) if i in graph.courses
+            )
+            line = f"- {course.course_code}: {course.title} ({course.credits:g} credits, level {_enum_text(course.level)})"
+            if prerequisites:
+                line += f". Prerequisites: {', '.join(prerequisites)}"
+            if course.description:
+                line += f". {' '.join(course.description.split())}"
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(lines) if len(lines) > 1 else None
+
+    def catalog_context(self, query: str) -> Optional[str]:
+        """
+        Catalog text to add to the system prompt for ``query``, or ``None``.
+
+        Blocking; call it from a worker thread in async code. The database is only
+        touched when the prerequisite graph has to be rebuilt.
+        """
+        with SessionLocal() as db:
+            graph = prerequisite_graph_index.get(db)
+        courses = self.retrieve(graph, query)
+        if not courses:
+            return None
+        return self.format_context(graph, courses)
+
+
+course_retriever = CourseRetriever(
+    index_path=settings.COURSE_INDEX_PATH,
+    top_k=settings.CHAT_CATALOG_TOP_K,
+    token_budget=settings.CHAT_CATALOG_TOKEN_BUDGET,
+)
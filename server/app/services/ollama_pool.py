@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from app.core.circuit_breaker import CircuitBreaker
+
+
+class OllamaBackend:
+    """One Ollama instance with its own health, circuit and load figures."""
+
+    def __init__(self, base_url: str, failure_threshold: int, reset_timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.outstanding = 0
+        # Exponentially weighted time to first token, in seconds; None until measured.
+        self.latency: Optional[float] = None
+        self.healthy: Optional[bool] = None
+        self.last_probe_at: Optional[datetime] = None
+
+    def record_latency(self, seconds: float, alpha: float = 0.3) -> None:
+        self.latency = seconds if self.latency is None else alpha * seconds + (1 - alpha) * self.latency
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "url": self.base_url,
+            "healthy": self.healthy,
+            "circuit": self.breaker.state.value,
+            "outstanding": self.outstanding,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "last_probe_at": self.last_probe_at.isoformat() if self.last_probe_at else None,
+        }
+
+    def __repr__(self):
+        return f"<OllamaBackend {self.base_url} outstanding={self.outstanding}>"
+
+
+class OllamaBackendPool:
+    """
+    Routes generations across several Ollama instances.
+
+    ``least_outstanding`` sends each request to the backend with the fewest
+    generations in flight (ties broken by latency); ``latency`` weighs the
+    in-flight count by each backend's measured time to first token. A request
+    carrying an affinity key (the chat session id) goes back to the backend
+    that served the key before for as long as that backend's circuit allows,
+    so Ollama can reuse the conversation prefix it already has cached.
+    """
+
+    STRATEGIES = ("least_outstanding", "latency")
+
+    def __init__(
+        self,
+        base_urls: Iterable[str],
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        max_affinity_keys: int = 10000,
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown Ollama routing strategy {strategy!r}; expected one of {self.STRATEGIES}")
+        self.backends: List[OllamaBackend] = [
+            OllamaBackend(url, failure_threshold, reset_timeout) for url in base_urls
+        ]
+        if not self.backends:
+            raise ValueError("At least one Ollama backend URL is required")
+        self.strategy = strategy
+        self.max_affinity_keys = max_affinity_keys
+        self._affinity: "OrderedDict[Hashable, OllamaBackend]" = OrderedDict()
+
+    def _score(self, backend: OllamaBackend):
+        latency = backend.latency or 0.0
+        if self.strategy == "latency":
+            return ((backend.outstanding + 1) * latency, backend.outstanding)
+        return (backend.outstanding, latency)
+
+    def is_available(self) -> bool:
+        return any(b.breaker.would_allow() for b in self.backends)
+
+    def acquire(self, affinity_key: Optional[Hashable] = None, exclude: Iterable[OllamaBackend] = ()) -> Optional[OllamaBackend]:
+        """Pick a backend and count a request against it; ``None`` if every circuit is open."""
+        excluded = set(exclude)
+        chosen = None
+        if affinity_key is not None:
+            pinned = self._affinity.get(affinity_key)
+            if pinned is not None and pinned not in excluded and pinned.breaker.allow_request():
+                chosen = pinned
+
+        if chosen is None:
+            candidates = sorted(
+                (b for b in self.backends if b not in excluded),
+                key=self._score,
+            )
+            for backend in candidates:
+                if backend.breaker.allow_request():
+                    chosen = backend
+                    break
+            if chosen is None:
+                return None
+
+        if affinity_key is not None:
+            self._affinity[affinity_key] = chosen
+            self._affinity.move_to_end(affinity_key)
+            while len(self._affinity) > self.max_affinity_keys:
+                self._affinity.popitem(last=False)
+        chosen.outstanding += 1
+        return chosen
+
+    def release(self, backend: OllamaBackend) -> None:
+        backend.outstanding -= 1
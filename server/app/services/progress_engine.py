@@ -0,0 +1,190 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.models.student_course import StudentCourse
+from app.models.course import Course as CourseModel
+
+GRADE_TO_POINTS = {"A": 4, "B": 3, "C": 2, "D": 1, "F": 0}
+SEMESTER_ORDER = {"Spring": 1, "Summer": 2, "Fall": 3}
+
+TranscriptRow = Tuple[StudentCourse, CourseModel]
+
+
+def grade_points(grade: Optional[str]) -> Optional[int]:
+    """Return the quality points for a letter grade, or None if it doesn't count toward GPA."""
+    if not grade:
+        return None
+    return GRADE_TO_POINTS.get(grade.upper())
+
+
+def semester_sort_key(key: Tuple[int, str]) -> Tuple[int, int]:
+    year, semester = key
+    return (year or 0, SEMESTER_ORDER.get(semester, 0))
+
+
+def load_transcript(db: Session, user_id: int, completed_only: bool = False) -> List[TranscriptRow]:
+    """Fetch a student's StudentCourse rows joined to their Course in a single query."""
+    query = (
+        db.query(StudentCourse, CourseModel)
+        .join(CourseModel, StudentCourse.course_id == CourseModel.id)
+        .filter(StudentCourse.user_id == user_id)
+    )
+    if completed_only:
+        query = query.filter(StudentCourse.completed.is_(True))
+    return query.all()
+
+
+class GPAAccumulator:
+    """Running credit and quality point totals for one bucket of courses."""
+
+    __slots__ = ("credits", "points", "credits_for_gpa", "rows")
+
+    def __init__(self):
+        self.credits = 0.0
+        self.points = 0.0
+        self.credits_for_gpa = 0.0
+        self.rows: List[TranscriptRow] = []
+
+    def add(self, sc: StudentCourse, course: CourseModel, points: Optional[int]) -> None:
+        self.rows.append((sc, course))
+        self.credits += course.credits
+        if points is not None:
+            self.points += points * course.credits
+            self.credits_for_gpa += course.credits
+
+    @property
+    def gpa(self) -> Optional[float]:
+        return round(self.points / self.credits_for_gpa, 2) if self.credits_for_gpa else None
+
+
+class TranscriptSummary:
+    """
+    Everything the progress pages need, computed in one pass over the transcript.
+
+    - ``completed``: totals over completed courses
+    - ``categories``: completed courses bucketed by ``Course.category``
+    - ``semesters``: every course (completed or planned) bucketed by ``(year, semester)``
+    """
+
+    def __init__(self, rows: List[TranscriptRow]):
+        self.rows = rows
+        self.completed = GPAAccumulator()
+        self.categories: Dict[object, GPAAccumulator] = {}
+        self.semesters: Dict[Tuple[int, str], GPAAccumulator] = {}
+
+        for sc, course in rows:
+            points = grade_points(sc.grade)
+
+            semester = self.semesters.get((sc.year, sc.semester))
+            if semester is None:
+                semester = self.semesters[(sc.year, sc.semester)] = GPAAccumulator()
+            semester.add(sc, course, points)
+
+            if not sc.completed:
+                continue
+
+            self.completed.add(sc, course, points)
+            category_key = getattr(course, "category", "Other")
+            category = self.categories.get(category_key)
+            if category is None:
+                category = self.categories[category_key] = GPAAccumulator()
+            category.add(sc, course, points)
+
+    @property
+    def completed_rows(self) -> List[TranscriptRow]:
+        return self.completed.rows
+
+    @property
+    def overall_gpa(self) -> float:
+        return self.completed.gpa or 0.0
+
+    def semester_timeline(self) -> List[Tuple[Tuple[int, str], GPAAccumulator, Optional[float]]]:
+        """Semesters in chronological order paired with the cumulative GPA at the end of each."""
+        timeline = []
+        cumulative_points = 0.0
+        cumulative_credits = 0.0
+        for key in sorted(self.semesters.keys(), key=semester_sort_key):
+            data = self.semesters[key]
+            cumulative_points += data.points
+            cumulative_credits += data.credits_for_gpa
+            cumulative_gpa = round(cumulative_points / cumulative_credits, 2) if cumulative_credits else None
+            timeline.append((key, data, cumulative_gpa))
+        return timeline
+
+
+def get_transcript_summary(db: Session, user_id: int) -> TranscriptSummary:
+    return TranscriptSummary(load_transcript(db, user_id))
+
+
+class CategoryCreditTotals:
+    """
+    Completed totals for one ``CourseCategory``. ``credits`` and the GPA sums
+    count every completed attempt; ``course_credits`` counts a retaken course once.
+    """
+
+    __slots__ = ("credits", "points", "credits_for_gpa", "course_credits")
+
+    def __init__(self, credits: float = 0.0, points: float = 0.0, credits_for_gpa: float = 0.0, course_credits: float = 0.0):
+        self.credits = credits
+        self.points = points
+        self.credits_for_gpa = credits_for_gpa
+        self.course_credits = course_credits
+
+
+class RequirementsTotals:
+    """Per-category completed credits plus the overall totals derived from them."""
+
+    def __init__(self, by_category: Dict[object, CategoryCreditTotals]):
+        self.by_category = by_category
+        self.credits = sum(t.credits for t in by_category.values())
+        self.points = sum(t.points for t in by_category.values())
+        self.credits_for_gpa = sum(t.credits_for_gpa for t in by_category.values())
+
+    @property
+    def gpa(self) -> float:
+        return round(self.points / self.credits_for_gpa, 2) if self.credits_for_gpa else 0.0
+
+    def credits_for(self, category) -> float:
+        """Credits toward a category requirement; a retaken course counts once."""
+        totals = self.by_category.get(category)
+        return totals.course_credits if totals else 0.0
+
+
+def get_requirements_totals(db: Session, user_id: int) -> RequirementsTotals:
+    """
+    Sum completed credits and grade points per course category with one grouped aggregate.
+
+    Attempts are first grouped per course, so the category sums can count a
+    retaken course's credits once as well as once per attempt.
+    """
+    grade = func.upper(StudentCourse.grade)
+    attempts = (
+        db.query(
+            StudentCourse.course_id.label("course_id"),
+            func.count().label("attempts"),
+            func.coalesce(func.sum(case(GRADE_TO_POINTS, value=grade, else_=None)), 0).label("points"),
+            func.count(case((grade.in_(list(GRADE_TO_POINTS)), 1), else_=None)).label("graded"),
+        )
+        .filter(StudentCourse.user_id == user_id, StudentCourse.completed.is_(True))
+        .group_by(StudentCourse.course_id)
+        .subquery()
+    )
+
+    rows = (
+        db.query(
+            CourseModel.category,
+            func.coalesce(func.sum(CourseModel.credits * attempts.c.attempts), 0.0),
+            func.coalesce(func.sum(CourseModel.credits * attempts.c.points), 0.0),
+            func.coalesce(func.sum(CourseModel.credits * attempts.c.graded), 0.0),
+            func.coalesce(func.sum(CourseModel.credits), 0.0),
+        )
+        .join(attempts, attempts.c.course_id == CourseModel.id)
+        .group_by(CourseModel.category)
+        .all()
+    )
+    return RequirementsTotals({
+        category: CategoryCreditTotals(float(credits), float(points), float(credits_for_gpa), float(course_credits))
+        for category, credits, points, credits_for_gpa, course_credits in rows
+    })
@@ -7,6 +7,7 @@ from sqlalchemy import func
 from typing import List
 from datetime import datetime
 from app.models.enums import CourseCategory
+from app.services.progress_engine import get_transcript_summary, get_requirements_totals, SEMESTER_ORDER
 
 def get_detailed_progress_for_student(user: User, db: Session) -> ProgressDetailedResponse:
     # Get student info
@@ -19,53 +20,12 @@ def get_detailed_progress_for_student(user: User, db: Session) -> ProgressDetail
         advisorName=user.advisor.first_name + " " + user.advisor.last_name if user.advisor else None
     )
 
-    # Get completed courses
-    completed_courses = (
-        db.query(StudentCourse)
-        .filter(StudentCourse.user_id == user.id, StudentCourse.completed.is_(True))
-        .all()
-    )
+    summary = get_transcript_summary(db, user.id)
 
     # Calculate overall progress
     total_required = 120  # TODO: Get from degree program
-    completed_hours = 0.0
-    total_points = 0.0
-    total_credits_for_gpa = 0.0
-    grade_to_points = {"A": 4, "B": 3, "C": 2, "D": 1, "F": 0}
-    categories = {}
-
-    # Process courses
-    for sc in completed_courses:
-        course = db.query(CourseModel).get(sc.course_id)
-        if not course:
-            continue
-            
-        completed_hours += course.credits
-        if sc.grade and sc.grade.upper() in grade_to_points:
-            points = grade_to_points[sc.grade.upper()]
-            total_points += points * course.credits
-            total_credits_for_gpa += course.credits
-
-        # Categorize course
-        cat = getattr(course, "category", "Other")
-        if cat not in categories:
-            categories[cat] = {
-                "courses": [],
-                "completed_credits": 0.0,
-                "total_credits": 0.0,
-                "total_points": 0.0,
-                "total_credits_for_gpa": 0.0,
-                "color": "#1976d2"  # Default color, TODO: Get from config
-            }
-        
-        categories[cat]["courses"].append(course)
-        categories[cat]["completed_credits"] += course.credits
-        if sc.grade and sc.grade.upper() in grade_to_points:
-            categories[cat]["total_points"] += grade_to_points[sc.grade.upper()] * course.credits
-            categories[cat]["total_credits_for_gpa"] += course.credits
-
-    # Calculate overall GPA
-    overall_gpa = round(total_points / total_credits_for_gpa, 2) if total_credits_for_gpa else 0.0
+    completed_hours = summary.completed.credits
+    overall_gpa = summary.overall_gpa
     progress_percentage = (completed_hours / total_required * 100) if total_required else 0.0
 
     # Create overview
@@ -81,25 +41,25 @@ def get_detailed_progress_for_student(user: User, db: Session) -> ProgressDetail
 
     # Create category progress list
     category_progress = []
-    for cat, data in categories.items():
-        cat_gpa = round(data["total_points"] / data["total_credits_for_gpa"], 2) if data["total_credits_for_gpa"] else 0.0
+    for cat, data in summary.categories.items():
+        total_credits = 0.0  # TODO: Get from degree program
         cat_courses = [
             CourseInfo(
                 id=course.id,
                 name=course.title,
                 credits=course.credits,
-                grade=next((sc.grade for sc in completed_courses if sc.course_id == course.id), None),
+                grade=sc.grade,
                 completed=True
             )
-            for course in data["courses"]
+            for sc, course in data.rows
         ]
-        
+
         category_progress.append(CategoryProgress(
             name=str(cat),
-            completed=data["completed_credits"],
-            total=data["total_credits"],
-            percentage=round((data["completed_credits"] / data["total_credits"] * 100) if data["total_credits"] else 0.0, 2),
-            color=data["color"],
+            completed=data.credits,
+            total=total_credits,
+            percentage=round((data.credits / total_credits * 100) if total_credits else 0.0, 2),
+            color="#1976d2",  # Default color, TODO: Get from config
             courses=cat_courses
         ))
 
@@ -110,59 +70,16 @@ def get_detailed_progress_for_student(user: User, db: Session) -> ProgressDetail
     )
 
 def get_semester_timeline_for_student(user: User, db: Session):
-    all_courses = (
-        db.query(StudentCourse)
-        .filter(StudentCourse.user_id == user.id)
-        .all()
-    )
-    
-    semester_order = {"Spring": 1, "Summer": 2, "Fall": 3}
-    timeline = {}
-    
-    # Group courses by semester
-    for sc in all_courses:
-        course = db.query(CourseModel).get(sc.course_id)
-        if not course:
-            continue
-            
-        key = (sc.year, sc.semester)
-        if key not in timeline:
-            timeline[key] = {
-                "courses": [],
-                "credits": 0.0,
-                "points": 0.0,
-                "credits_for_gpa": 0.0
-            }
-            
-        timeline[key]["courses"].append((sc, course))
-        timeline[key]["credits"] += course.credits
-        
-        if sc.grade and sc.grade.upper() in {"A", "B", "C", "D", "F"}:
-            points = {"A": 4, "B": 3, "C": 2, "D": 1, "F": 0}[sc.grade.upper()]
-            timeline[key]["points"] += points * course.credits
-            timeline[key]["credits_for_gpa"] += course.credits
-    
-    # Calculate semester GPAs and cumulative GPA
+    summary = get_transcript_summary(db, user.id)
+
+    now = datetime.now()
+    current_year = now.year
+    current_semester = "Fall" if now.month >= 8 else "Spring"
+
     semester_list = []
-    cumulative_points = 0.0
-    cumulative_credits = 0.0
-    
-    for (year, semester) in sorted(timeline.keys(), key=lambda x: (x[0], semester_order.get(x[1], 0))):
-        data = timeline[(year, semester)]
-        
-        # Calculate semester GPA
-        semester_gpa = round(data["points"] / data["credits_for_gpa"], 2) if data["credits_for_gpa"] else None
-        
-        # Update cumulative GPA
-        cumulative_points += data["points"]
-        cumulative_credits += data["credits_for_gpa"]
-        cumulative_gpa = round(cumulative_points / cumulative_credits, 2) if cumulative_credits else None
-        
+    for (year, semester), data, cumulative_gpa in summary.semester_timeline():
         # Determine semester status
-        current_year = datetime.now().year
-        current_semester = "Fall" if datetime.now().month >= 8 else "Spring"
-        
-        if year > current_year or (year == current_year and semester_order[semester] > semester_order[current_semester]):
+        if year > current_year or (year == current_year and SEMESTER_ORDER[semester] > SEMESTER_ORDER[current_semester]):
             status = "Planned"
             status_color = "grey.500"
         elif year == current_year and semester == current_semester:
@@ -171,7 +88,7 @@ def get_semester_timeline_for_student(user: User, db: Session):
         else:
             status = "Completed"
             status_color = "success.main"
-        
+
         # Format semester courses
         semester_courses = [
             {
@@ -181,20 +98,20 @@ def get_semester_timeline_for_student(user: User, db: Session):
                 "grade": sc.grade or "-",
                 "completed": sc.completed
             }
-            for sc, course in data["courses"]
+            for sc, course in data.rows
         ]
-        
+
         semester_list.append({
             "year": year,
             "semester": semester,
             "status": status,
             "statusColor": status_color,
             "courses": semester_courses,
-            "credits": data["credits"],
-            "semesterGPA": semester_gpa,
+            "credits": data.credits,
+            "semesterGPA": data.gpa,
             "cumulativeGPA": cumulative_gpa
         })
-    
+
     return semester_list
 
 def get_graduation_requirements_for_student(user: User, db: Session):
@@ -209,18 +126,12 @@ def get_graduation_requirements_for_student(user: User, db: Session):
     else:
         program_requirements = {}
     
+    totals = get_requirements_totals(db, user.id)
+
     # Calculate total credits
     total_required = 120  # TODO: Get from degree program
-    completed_hours = db.query(StudentCourse, CourseModel).join(
-        CourseModel, 
-        StudentCourse.course_id == CourseModel.id
-    ).filter(
-        StudentCourse.user_id == user.id, 
-        StudentCourse.completed.is_(True)
-    ).with_entities(
-        func.coalesce(func.sum(CourseModel.credits), 0.0)
-    ).scalar()
-    
+    completed_hours = totals.credits
+
     # Add institutional requirements
     requirements["institutional"].append({
         "title": "Total Credits",
@@ -228,66 +139,35 @@ def get_graduation_requirements_for_student(user: User, db: Session):
         "status": "completed" if completed_hours >= total_required else "in-progress",
         "details": f"{completed_hours}/{total_required} credits completed"
     })
-    
+
     # Calculate GPA
-    grade_to_points = {"A": 4, "B": 3, "C": 2, "D": 1, "F": 0}
-    completed_courses = db.query(StudentCourse, CourseModel).join(
-        CourseModel, 
-        StudentCourse.course_id == CourseModel.id
-    ).filter(
-        StudentCourse.user_id == user.id, 
-        StudentCourse.completed.is_(True)
-    ).all()
-    
-    total_points = 0.0
-    total_credits_for_gpa = 0.0
-    for sc, course in completed_courses:
-        if sc.grade and sc.grade.upper() in grade_to_points:
-            total_points += grade_to_points[sc.grade.upper()] * course.credits
-            total_credits_for_gpa += course.credits
-    
-    gpa = round(total_points / total_credits_for_gpa, 2) if total_credits_for_gpa else 0.0
+    gpa = totals.gpa
     min_gpa = 2.0
-    
+
     requirements["institutional"].append({
         "title": "Minimum GPA",
         "description": "Maintain minimum GPA requirement",
         "status": "completed" if gpa >= min_gpa else "in-progress",
         "details": f"Current GPA: {gpa} (Minimum: {min_gpa})"
     })
-    
+
     # Add academic requirements by category
     for category, required_credits in program_requirements.items():
         try:
             # Convert category string to enum value
             category_enum = CourseCategory(category.upper())
-            
-            # Get all courses in this category
-            category_courses = db.query(CourseModel).filter(
-                CourseModel.category == category_enum
-            ).all()
-            
-            # Calculate completed credits for this category
-            category_credits = 0.0
-            for course in category_courses:
-                student_course = db.query(StudentCourse).filter(
-                    StudentCourse.user_id == user.id,
-                    StudentCourse.course_id == course.id,
-                    StudentCourse.completed.is_(True)
-                ).first()
-                if student_course:
-                    category_credits += course.credits
-            
-            requirements["academic"].append({
-                "title": f"{category} Requirements",
-                "description": f"Complete {required_credits} credits in {category}",
-                "status": "completed" if category_credits >= required_credits else "in-progress",
-                "details": f"{category_credits}/{required_credits} credits completed"
-            })
         except ValueError:
             # Skip invalid category values
             continue
-    
+
+        category_credits = totals.credits_for(category_enum)
+        requirements["academic"].append({
+            "title": f"{category} Requirements",
+            "description": f"Complete {required_credits} credits in {category}",
+            "status": "completed" if category_credits >= required_credits else "in-progress",
+            "details": f"{category_credits}/{required_credits} credits completed"
+        })
+
     return requirements
 
 def calculate_performance_metrics(courses_data: List[tuple], db: Session) -> dict:
@@ -384,31 +264,20 @@ def calculate_academic_analytics(user: User, db: Session):
     """Get comprehensive academic analytics for a student."""
     from datetime import datetime
     
-    # Get all completed courses
-    completed_courses = (
-        db.query(StudentCourse)
-        .filter(StudentCourse.user_id == user.id, StudentCourse.completed.is_(True))
-        .all()
-    )
-    
+    summary = get_transcript_summary(db, user.id)
+
     # Prepare course data
-    courses_data = []
+    courses_data = summary.completed_rows
     major_courses_data = []
     gen_ed_courses_data = []
-    
-    for sc in completed_courses:
-        course = db.query(CourseModel).get(sc.course_id)
-        if not course:
-            continue
-            
-        courses_data.append((sc, course))
-        
+
+    for sc, course in courses_data:
         # Categorize courses
         if course.category == "MAJOR":
             major_courses_data.append((sc, course))
         elif course.category == "GEN_ED":
             gen_ed_courses_data.append((sc, course))
-    
+
     # Calculate metrics for each category
     overall_metrics = calculate_performance_metrics(courses_data, db)
     major_metrics = calculate_performance_metrics(major_courses_data, db) if major_courses_data else None
@@ -0,0 +1,110 @@
+import asyncio
+import bisect
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+
+
+class LiveReply:
+    """
+    An AI reply while it is being streamed, readable from any offset.
+
+    Offsets are character positions in the reply; they double as SSE event ids
+    so a reconnecting client can say exactly where it left off. Chunks are kept
+    as received, with the offset each one ends at, so appending and following
+    stay linear in the length of the reply.
+    """
+
+    __slots__ = ("user_id", "session_id", "done", "aborted", "_chunks", "_ends", "_changed")
+
+    def __init__(self, user_id: int, session_id: UUID):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.done = False
+        self.aborted = False
+        self._chunks: List[str] = []
+        self._ends: List[int] = []
+        self._changed = asyncio.Event()
+
+    @property
+    def length(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def text_from(self, offset: int) -> str:
+        """The reply from character ``offset`` on."""
+        index = bisect.bisect_right(self._ends, offset)
+        if index == len(self._chunks):
+            return ""
+        start = self._ends[index - 1] if index else 0
+        return self._chunks[index][offset - start:] + "".join(self._chunks[index + 1:])
+
+    def _notify(self) -> None:
+        # Swap in a fresh event so a follower can never miss a wakeup that
+        # another follower already cleared.
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def append(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        self._ends.append(self.length + len(chunk))
+        self._notify()
+
+    def finish(self, aborted: bool = False) -> None:
+        self.done = True
+        self.aborted = aborted
+        self._notify()
+
+    async def follow(self, offset: int = 0) -> AsyncIterator[Tuple[int, str]]:
+        """Yield ``(end offset, text)`` pieces from ``offset`` on until the reply is finished."""
+        while True:
+            changed = self._changed
+            length = self.length
+            if length > offset:
+                chunk = self.text_from(offset)
+                offset = length
+                yield offset, chunk
+                continue
+            if self.done:
+                return
+            await changed.wait()
+
+
+class ReplyRegistry:
+    """
+    The latest reply per ``(user_id, session_id)`` in this process.
+
+    Finished replies linger for ``grace_period`` seconds so a client that
+    reconnects right after the stream ended is served from memory, before the
+    write-behind queue has necessarily flushed the reply to Postgres.
+    """
+
+    def __init__(self, grace_period: float):
+        self.grace_period = grace_period
+        self._replies: Dict[Tuple[int, UUID], LiveReply] = {}
+
+    def start(self, user_id: int, session_id: UUID) -> LiveReply:
+        reply = LiveReply(user_id, session_id)
+        self._replies[(user_id, session_id)] = reply
+        return reply
+
+    def get(self, user_id: int, session_id: UUID) -> Optional[LiveReply]:
+        return self._replies.get((user_id, session_id))
+
+    def finish(self, reply: LiveReply, aborted: bool = False) -> None:
+        reply.finish(aborted)
+        asyncio.get_running_loop().call_later(self.grace_period, self._drop, reply)
+
+    def _drop(self, reply: LiveReply) -> None:
+        key = (reply.user_id, reply.session_id)
+        if self._replies.get(key) is reply:
+            del self._replies[key]
+
+
+reply_registry = ReplyRegistry(grace_period=settings.CHAT_REPLY_GRACE_PERIOD)
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import AsyncIterator, Dict, FrozenSet, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.course_retrieval import tokenize
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_FIRST_PERSON_RE = re.compile(r"\b(i|i'm|i've|me|my|mine|myself)\b", re.IGNORECASE)
+_REPLAY_PIECE_RE = re.compile(r"\S+\s*|\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the answer."""
+    return _WHITESPACE_RE.sub(" ", text.lower()).strip().rstrip("?!. ")
+
+
+def is_personal(text: str) -> bool:
+    """Questions about the asker's own record need their snapshot; others are answered without it and shared."""
+    return _FIRST_PERSON_RE.search(text) is not None
+
+
+def context_fingerprint(*parts: object) -> str:
+    return hashlib.sha1("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    __slots__ = ("response", "vector", "norm", "numbers", "expires_at")
+
+    def __init__(self, response: str, vector: Counter, numbers: FrozenSet[str], expires_at: float):
+        self.response = response
+        self.vector = vector
+        self.norm = math.sqrt(sum(v * v for v in vector.values()))
+        self.numbers = numbers
+        self.expires_at = expires_at
+
+
+def _features(normalized: str) -> Tuple[Counter, FrozenSet[str]]:
+    tokens = tokenize(normalized)
+    return Counter(tokens), frozenset(t for t in tokens if any(ch.isdigit() for ch in t))
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of complete advisor answers.
+
+    Entries are keyed on ``(context, normalized prompt)``. ``context`` is a
+    fingerprint of everything else the answer depends on (catalog version,
+    and for personal questions the student's id and snapshot digest), so a
+    change to any of them simply stops old entries from matching.
+
+    A miss on the exact key falls back to a cosine-similarity scan over the
+    bag-of-terms vectors of the same context, which catches rephrasings such as
+    "prerequisites for CMPS 390" vs "what are the prerequisites of cmps 390". Both
+    sides must mention exactly the same numbers (course codes, credit counts)
+    for a similarity hit, so CMPS 390 never answers for CMPS 391.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, similarity_threshold: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self._by_context: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, context: str, prompt: str) -> Optional[str]:
+        now = time.monotonic()
+        normalized = normalize_prompt(prompt)
+        key = (context, normalized)
+        entry = self._entries.get(key)
+        if entry is not None and now >= entry.expires_at:
+            self._remove(key)
+            entry = None
+
+        if entry is None and self.similarity_threshold < 1.0:
+            key, entry = self._nearest(context, normalized, now)
+
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.response
+
+    def _nearest(self, context: str, normalized: str, now: float):
+        vector, numbers = _features(normalized)
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        if not norm:
+            return None, None
+        best_key, best_entry, best_score = None, None, self.similarity_threshold
+        expired = []
+        for candidate in self._by_context.get(context, ()):
+            candidate_key = (context, candidate)
+            entry = self._entries[candidate_key]
+            if now >= entry.expires_at:
+                expired.append(candidate_key)
+                continue
+            if entry.numbers != numbers or not entry.norm:
+                continue
+            dot = sum(count * entry.vector.get(term, 0) for term, count in vector.items())
+            score = dot / (norm * entry.norm)
+            if score >= best_score:
+                best_key, best_entry, best_score = candidate_key, entry, score
+        for key in expired:
+            self._remove(key)
+        return best_key, best_entry
+
+    def put(self, context: str, prompt: str, response: str) -> None:
+        normalized = normalize_prompt(prompt)
+        key = (context, normalized)
+        vector, numbers = _features(normalized)
+        self._entries[key] = CachedResponse(response, vector, numbers, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        self._by_context.setdefault(context, set()).add(normalized)
+        while len(self._entries) > self.max_entries:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        prompts = self._by_context.get(key[0])
+        if prompts is not None:
+            prompts.discard(key[1])
+            if not prompts:
+                del self._by_context[key[0]]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_context.clear()
+
+
+async def replay_response(response: str, delay: float = 0.0) -> AsyncIterator[str]:
+    """Stream a cached answer back word by word, the way ``chat_stream`` yields tokens."""
+    for piece in _REPLAY_PIECE_RE.findall(response):
+        yield piece
+        await asyncio.sleep(delay)
+
+
+response_cache = ResponseCache(
+    ttl=settings.RESPONSE_CACHE_TTL,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY,
+)
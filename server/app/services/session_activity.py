@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.user_session import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+class SessionActivityTracker:
+    """
+    Write-behind ``last_activity`` for ``UserSession`` rows, plus the sweeper
+    that retires old sessions.
+
+    ``touch`` only records the time in memory; repeated touches of one session
+    collapse into one entry, and every ``flush_interval`` seconds all of them
+    are written with a single executemany UPDATE. Every ``sweep_interval``
+    seconds, sessions past their expiry or idle for ``idle_timeout`` are
+    deactivated in bulk, and inactive sessions untouched for ``retention``
+    are deleted so the table stops growing.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        flush_interval: float = 30.0,
+        sweep_interval: float = 3600.0,
+        idle_timeout: timedelta = timedelta(days=30),
+        retention: timedelta = timedelta(days=30),
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self.idle_timeout = idle_timeout
+        self.retention = retention
+        self._touched: Dict[int, datetime] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def touch(self, session_id: int) -> None:
+        self._touched[session_id] = datetime.now(timezone.utc)
+
+    async def flush(self) -> int:
+        """Write the collected activity times in one transaction. Returns the number of sessions updated."""
+        async with self._flush_lock:
+            if not self._touched:
+                return 0
+            batch, self._touched = self._touched, {}
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(
+                        update(UserSession),
+                        [{"id": session_id, "last_activity": at} for session_id, at in batch.items()],
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Failed to flush activity for {len(batch)} sessions, will retry: {e}")
+                # Keep the batch, but let anything touched meanwhile win.
+                batch.update(self._touched)
+                self._touched = batch
+                return 0
+            return len(batch)
+
+    async def sweep(self) -> Tuple[int, int]:
+        """Deactivate expired and idle sessions, delete long-inactive ones. Returns both row counts."""
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as db:
+            deactivated = await db.execute(
+                update(UserSession)
+                .where(
+                    UserSession.is_active == True,
+                    or_(
+                        UserSession.expires_at < now,
+                        UserSession.last_activity < now - self.idle_timeout,
+                    ),
+                )
+                .values(is_active=False)
+                .execution_options(synchronize_session=False)
+            )
+            deleted = await db.execute(
+                delete(UserSession)
+                .where(and_(
+                    UserSession.is_active == False,
+                    UserSession.last_activity < now - self.retention,
+                ))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if deactivated.rowcount or deleted.rowcount:
+            logger.info(f"Session sweep: {deactivated.rowcount} deactivated, {deleted.rowcount} deleted")
+        return deactivated.rowcount, deleted.rowcount
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_sweep = loop.time()
+        while not self._stopping.is_set():
+            if loop.time() >= next_sweep:
+                try:
+                    await self.sweep()
+                except Exception as e:
+                    logger.error(f"Session sweep failed: {e}")
+                next_sweep = loop.time() + self.sweep_interval
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out any pending activity."""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+session_activity = SessionActivityTracker(
+    flush_interval=settings.SESSION_ACTIVITY_FLUSH_INTERVAL,
+    sweep_interval=settings.SESSION_SWEEP_INTERVAL,
+    idle_timeout=timedelta(days=settings.SESSION_IDLE_TIMEOUT_DAYS),
+    retention=timedelta(days=settings.SESSION_RETENTION_DAYS),
+)
@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.services.prerequisite_graph import PrerequisiteGraph, prerequisite_graph_index
+from app.models.enums import CourseCategory
+from app.models.student_course import StudentCourse
+from app.models.user import User
+from app.services.progress_engine import (
+    RequirementsTotals,
+    TranscriptSummary,
+    get_requirements_totals,
+    get_transcript_summary,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_LISTED_COMPLETED = 40
+MAX_ELIGIBLE = 8
+
+
+class StudentSnapshot:
+    """Prompt-ready summary of one student's academic record."""
+
+    __slots__ = ("user_id", "text", "digest", "catalog_version", "expires_at")
+
+    def __init__(self, user_id: int, text: str, catalog_version: int, expires_at: float):
+        self.user_id = user_id
+        self.text = text
+        self.digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        self.catalog_version = catalog_version
+        self.expires_at = expires_at
+
+
+def _format_credits(value: float) -> str:
+    return f"{value:g}"
+
+
+def render_student_snapshot(
+    user: User, summary: TranscriptSummary, totals: RequirementsTotals, graph: PrerequisiteGraph
+) -> str:
+    """
+    Compact text form of a student's progress for the advisor system prompt.
+
+    One line per fact and course codes only, so a full transcript costs a few
+    dozen tokens instead of the pasted-in text students would otherwise send.
+    """
+    completed_codes = sorted(course.course_code for _, course in summary.completed_rows)
+    lines = ["Student record (from the advising system, treat as accurate):"]
+    if user.current_degree_program:
+        lines.append(f"Program: {user.current_degree_program.name}")
+    lines.append(
+        f"Completed: {_format_credits(summary.completed.credits)} credits, GPA {summary.overall_gpa:.2f}"
+    )
+
+    if completed_codes:
+        listed = ", ".join(completed_codes[:MAX_LISTED_COMPLETED])
+        if len(completed_codes) > MAX_LISTED_COMPLETED:
+            listed += f" (+{len(completed_codes) - MAX_LISTED_COMPLETED} more)"
+        lines.append(f"Completed courses: {listed}")
+
+    in_progress = sorted(course.course_code for sc, course in summary.rows if not sc.completed)
+    if in_progress:
+        lines.append(f"In progress/planned: {', '.join(in_progress)}")
+
+    program_requirements = (
+        user.current_degree_program.category_requirements or {}
+    ) if user.current_degree_program else {}
+    remaining = []
+    for category, required_credits in program_requirements.items():
+        try:
+            category_enum = CourseCategory(category.upper())
+        except ValueError:
+            continue
+        left = required_credits - totals.credits_for(category_enum)
+        if left > 0:
+            remaining.append(f"{category} {_format_credits(left)}")
+    if remaining:
+        lines.append(f"Credits still needed by category: {', '.join(remaining)}")
+
+    completed_mask = graph.mask_of(sc.course_id for sc, _ in summary.completed_rows)
+    planned_mask = graph.mask_of(sc.course_id for sc, _ in summary.rows if not sc.completed)
+    # Courses just unlocked by the transcript first, then open-entry courses.
+    eligible = graph.courses_in(graph.unlocked_mask(completed_mask) & ~planned_mask, MAX_ELIGIBLE)
+    if len(eligible) < MAX_ELIGIBLE:
+        open_mask = graph.no_prerequisites_mask & ~completed_mask & ~planned_mask
+        eligible += graph.courses_in(open_mask, MAX_ELIGIBLE - len(eligible))
+    if eligible:
+        lines.append(f"Eligible next: {', '.join(c.course_code for c in eligible)}")
+
+    return "\n".join(lines)
+
+
+class StudentSnapshotCache:
+    """
+    Per-user LRU of ``StudentSnapshot`` objects.
+
+    Entries are dropped when one of the user's ``StudentCourse`` rows is
+    committed, when the catalog version changes, or after ``ttl`` seconds as a
+    backstop for profile edits and for transcript edits made through other
+    workers. A per-user generation counter keeps a snapshot built from
+    pre-invalidation data from being stored; it is only kept while a build
+    for that user is in flight.
+    """
+
+    def __init__(self, ttl: float, max_users: int = 4096):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[int, StudentSnapshot]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._building: Dict[int, int] = {}
+
+    def get(self, user_id: int) -> StudentSnapshot:
+        """Return the cached snapshot, building it on a miss. Blocking; run it in a worker thread."""
+        catalog_version = prerequisite_graph_index.version
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if (
+                snapshot is not None
+                and snapshot.catalog_version == catalog_version
+                and time.monotonic() < snapshot.expires_at
+            ):
+                self._snapshots.move_to_end(user_id)
+                return snapshot
+            generation = self._generations.get(user_id, 0)
+            self._building[user_id] = self._building.get(user_id, 0) + 1
+
+        try:
+            snapshot = self._build(user_id)
+        finally:
+            with self._lock:
+                current = self._generations.get(user_id, 0)
+                self._building[user_id] -= 1
+                if not self._building[user_id]:
+                    del self._building[user_id]
+                    self._generations.pop(user_id, None)
+
+        with self._lock:
+            if current == generation:
+                self._snapshots[user_id] = snapshot
+                self._snapshots.move_to_end(user_id)
+                while len(self._snapshots) > self.max_users:
+                    self._snapshots.popitem(last=False)
+        return snapshot
+
+    def _build(self, user_id: int) -> StudentSnapshot:
+        with SessionLocal() as db:
+            graph = prerequisite_graph_index.get(db)
+            user = db.get(User, user_id)
+            summary = get_transcript_summary(db, user_id)
+            totals = get_requirements_totals(db, user_id)
+            text = render_student_snapshot(user, summary, totals, graph)
+        return StudentSnapshot(user_id, text, graph.version, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_ids: Set[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._snapshots.pop(user_id, None)
+                if user_id in self._building:
+                    self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+def create_student_snapshot_cache() -> StudentSnapshotCache:
+    # Commit hooks only invalidate this process's copy, so with several workers
+    # the TTL is all that bounds how stale another worker's snapshot can be.
+    ttl = settings.STUDENT_SNAPSHOT_TTL
+    if settings.WEB_CONCURRENCY > 1 and ttl > settings.STUDENT_SNAPSHOT_SHARED_TTL:
+        ttl = settings.STUDENT_SNAPSHOT_SHARED_TTL
+        logger.warning(
+            f"Capping the student snapshot TTL at {ttl:g}s with {settings.WEB_CONCURRENCY} workers: "
+            f"transcript edits made through other workers are not invalidated here"
+        )
+    return StudentSnapshotCache(ttl=ttl)
+
+
+student_snapshot_cache = create_student_snapshot_cache()
+
+_TRANSCRIPT_CHANGED = "transcript_changed_user_ids"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_transcript_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, StudentCourse):
+            session.info.setdefault(_TRANSCRIPT_CHANGED, set()).add(obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    user_ids = session.info.pop(_TRANSCRIPT_CHANGED, None)
+    if user_ids:
+        student_snapshot_cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_TRANSCRIPT_CHANGED, None)
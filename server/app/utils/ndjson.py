@@ -0,0 +1,84 @@
+import json
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Callable, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def default_loads() -> Callable[[bytes], Any]:
+    """orjson when it is installed, the stdlib parser otherwise. Both accept raw bytes."""
+    return orjson.loads if orjson is not None else json.loads
+
+
+class NDJSONDecoder:
+    """
+    Incremental newline-delimited JSON decoder for streamed HTTP bodies.
+
+    Chunks are appended to a ``bytearray`` and only the unscanned tail is searched
+    for newlines, so framing is linear in the size of the stream. Lines are cut at
+    the byte level and handed to the JSON parser as bytes: ``\\n`` never occurs
+    inside a multi-byte UTF-8 sequence, so a character split across two chunks is
+    simply reassembled in the buffer before its line is decoded.
+    """
+
+    def __init__(self, loads: Optional[Callable[[bytes], Any]] = None, max_line_bytes: int = 1 << 20):
+        self.loads = loads or default_loads()
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._scanned = 0
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Add a chunk and return every JSON value completed by it."""
+        buffer = self._buffer
+        buffer += chunk
+        values = []
+        start = 0
+        position = self._scanned
+        while True:
+            newline = buffer.find(b"\n", position)
+            if newline == -1:
+                break
+            self._parse_line(buffer[start:newline], values)
+            start = position = newline + 1
+
+        if start:
+            del buffer[:start]
+        self._scanned = len(buffer)
+        if self._scanned > self.max_line_bytes:
+            logger.warning(f"Discarding unterminated NDJSON line of {self._scanned} bytes")
+            buffer.clear()
+            self._scanned = 0
+        return values
+
+    def flush(self) -> List[Any]:
+        """Decode whatever is left once the stream has ended without a trailing newline."""
+        values = []
+        if self._buffer:
+            self._parse_line(self._buffer, values)
+            self._buffer.clear()
+            self._scanned = 0
+        return values
+
+    def _parse_line(self, line: bytearray, values: List[Any]) -> None:
+        line = bytes(line).strip()
+        if not line:
+            return
+        try:
+            values.append(self.loads(line))
+        except ValueError:
+            logger.warning(f"Failed to decode JSON from stream: {line[:200]!r}")
+
+
+async def aiter_ndjson(chunks: AsyncIterable[bytes], decoder: Optional[NDJSONDecoder] = None) -> AsyncIterator[Any]:
+    """Yield each JSON value from an async stream of byte chunks (e.g. ``response.aiter_bytes()``)."""
+    decoder = decoder or NDJSONDecoder()
+    async for chunk in chunks:
+        for value in decoder.feed(chunk):
+            yield value
+    for value in decoder.flush():
+        yield value
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Optional
+
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+# Stop nginx and similar proxies from buffering the stream.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+_END = object()
+
+# The line endings the SSE format recognises; any of them inside ``data``
+# would otherwise end the field early.
+_LINE_BREAK_RE = re.compile(r"\r\n|\r|\n")
+
+
+def sse_event(data: str, event: Optional[str] = None, id: Optional[str] = None, retry: Optional[int] = None) -> str:
+    """
+    Frame one Server-Sent Event.
+
+    Every line of ``data`` gets its own ``data:`` field; the client joins them
+    back with newlines, so multi-line chunks survive intact (a CR or CRLF line
+    break arrives as a plain newline).
+    """
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    lines.extend(f"data: {line}" for line in _LINE_BREAK_RE.split(data))
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_comment(text: str = "keep-alive") -> str:
+    return f": {text}\n\n"
+
+
+async def with_heartbeat(
+    events: AsyncIterator[str], interval: float, request: Optional[Request] = None
+) -> AsyncIterator[str]:
+    """
+    Relay framed ``events`` and emit a comment whenever nothing was sent for ``interval`` seconds.
+
+    ``events`` runs in its own task so a slow upstream (a queued request, or a
+    model still evaluating the prompt) doesn't starve the heartbeat. When the
+    client goes away - the response is cancelled, or ``request`` reports a
+    disconnect at a heartbeat - that task is cancelled too, which runs the
+    producer's cleanup and lets it abandon its upstream work.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for item in events:
+                queue.put_nowait(item)
+        except Exception as e:
+            logger.error(f"SSE event source failed: {str(e)}")
+        finally:
+            queue.put_nowait(_END)
+
+    producer = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=interval)
+            except asyncio.TimeoutError:
+                if request is not None and await request.is_disconnected():
+                    logger.info("SSE client disconnected; cancelling stream")
+                    return
+                yield sse_comment()
+                continue
+            if item is _END:
+                return
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
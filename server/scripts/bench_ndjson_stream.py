@@ -0,0 +1,110 @@
+"""
+Micro-benchmark for NDJSON stream framing.
+
+Replays an Ollama /api/chat stream (a recorded file, or a synthetic one) through
+the old str-buffer splitter and through app.utils.ndjson.NDJSONDecoder at several
+chunk sizes.
+
+    python -m scripts.bench_ndjson_stream
+    python -m scripts.bench_ndjson_stream --file recorded_stream.ndjson --repeat 20
+
+Record a real stream with:
+
+    curl -sN http://localhost:11434/api/chat -d '{"model": "mistral", "messages": [{"role": "user", "content": "Plan my CMPS degree"}]}' > recorded_stream.ndjson
+"""
+import argparse
+import json
+import time
+
+from app.utils.ndjson import NDJSONDecoder, orjson
+
+
+def synthetic_stream(tokens: int = 4000) -> bytes:
+    words = ["Prérequis ", "CMPS ", "390 ", "requires ", "161 ", "and ", "280. ", "📚 ", "Good luck! "]
+    lines = []
+    for i in range(tokens):
+        lines.append(json.dumps({
+            "model": "mistral",
+            "created_at": "2025-06-11T15:25:03.552882Z",
+            "message": {"role": "assistant", "content": words[i % len(words)]},
+            "done": False,
+        }, ensure_ascii=False))
+    lines.append(json.dumps({
+        "model": "mistral", "message": {"role": "assistant", "content": ""}, "done": True,
+        "total_duration": 41000000000, "prompt_eval_count": 512, "eval_count": tokens,
+    }))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def legacy_split(chunks) -> int:
+    """The framing chat_stream used before NDJSONDecoder."""
+    content = 0
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode("utf-8", errors="replace")
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            if line.strip():
+                try:
+                    content += len(json.loads(line).get("message", {}).get("content", ""))
+                except json.JSONDecodeError:
+                    pass
+    return content
+
+
+def decoder_split(chunks, loads=None) -> int:
+    content = 0
+    decoder = NDJSONDecoder(loads=loads)
+    for chunk in chunks:
+        for frame in decoder.feed(chunk):
+            content += len(frame.get("message", {}).get("content", ""))
+    for frame in decoder.flush():
+        content += len(frame.get("message", {}).get("content", ""))
+    return content
+
+
+def bench(fn, chunks, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="recorded Ollama NDJSON stream to replay")
+    parser.add_argument("--tokens", type=int, default=4000, help="frames in the synthetic stream")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            data = f.read()
+    else:
+        data = synthetic_stream(args.tokens)
+    lines = data.count(b"\n")
+    print(f"Stream: {len(data)} bytes, {lines} lines")
+
+    candidates = [("legacy str split", legacy_split), ("NDJSONDecoder json", lambda c: decoder_split(c, json.loads))]
+    if orjson is not None:
+        candidates.append(("NDJSONDecoder orjson", lambda c: decoder_split(c, orjson.loads)))
+
+    for size in (7, 64, 1024, 16384, len(data)):
+        chunks = chunked(data, size)
+        # Odd chunk sizes split multi-byte characters; the legacy path mangles them.
+        expected = decoder_split(chunks, json.loads)
+        print(f"\nchunk size {size} ({len(chunks)} chunks)")
+        for name, fn in candidates:
+            elapsed = bench(fn, chunks, args.repeat)
+            ok = "ok" if fn(chunks) == expected else "MISMATCH"
+            print(f"  {name:<22} {elapsed * 1000:9.2f} ms  {ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Stand-in Ollama server for exercising the backend pool, streaming and load tests
+without a model.
+
+Serves ``/api/tags`` and a streaming ``/api/chat`` that emits NDJSON frames at a
+fixed pace, ending with a ``done`` frame carrying the usual timing stats.
+
+    python -m scripts.fake_ollama --port 11435
+    python -m scripts.fake_ollama --port 11436 --tokens 200 --token-delay 0.05 --first-token-delay 2
+
+Then point the app at them:
+
+    OLLAMA_BASE_URLS=http://localhost:11435,http://localhost:11436
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = "Based on your transcript you can take CMPS 280 next semester once CMPS 161 is complete. ".split(" ")
+
+
+def create_app(model: str = "mistral", tokens: int = 60, token_delay: float = 0.02,
+               first_token_delay: float = 0.2, fail_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="fake-ollama")
+    app.state.requests = 0
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": f"{model}:latest", "size": 4109865159}]}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if fail_rate and (app.state.requests % max(1, round(1 / fail_rate))) == 0:
+            return JSONResponse({"error": "simulated failure"}, status_code=500)
+
+        async def frames():
+            started = time.perf_counter_ns()
+            await asyncio.sleep(first_token_delay)
+            for i in range(tokens):
+                yield json.dumps({
+                    "model": body.get("model", model),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "message": {"role": "assistant", "content": WORDS[i % len(WORDS)] + " "},
+                    "done": False,
+                }) + "\n"
+                await asyncio.sleep(token_delay)
+            total = time.perf_counter_ns() - started
+            yield json.dumps({
+                "model": body.get("model", model),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "total_duration": total,
+                "load_duration": 0,
+                "prompt_eval_count": sum(len(m.get("content", "")) // 4 for m in body.get("messages", [])),
+                "prompt_eval_duration": int(first_token_delay * 1e9),
+                "eval_count": tokens,
+                "eval_duration": int(tokens * token_delay * 1e9),
+            }) + "\n"
+
+        return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default="mistral")
+    parser.add_argument("--tokens", type=int, default=60, help="content frames per answer")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between frames")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="simulated prompt evaluation time")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of /api/chat calls answered with 500")
+    args = parser.parse_args()
+
+    app = create_app(args.model, args.tokens, args.token_delay, args.first_token_delay, args.fail_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""
+Offline load test for the chat pipeline.
+
+Simulates N concurrent students, each holding one chat session of several turns
+with think time in between, and reports throughput, time to first token and
+end-to-end latency percentiles. No model is needed: answers come from the stub
+Ollama server in scripts.fake_ollama.
+
+``service`` mode (the default) runs OllamaService in this process, behind the
+same admission queue and session affinity the chat endpoint uses, against stub
+backends started here. It needs neither Postgres nor Redis:
+
+    python -m scripts.load_test_chat --users 50 --turns 3:8 --think-time 2
+    python -m scripts.load_test_chat --users 50 --backends 2 --token-delay 0.05 --output pooled.json
+
+``http`` mode drives ``POST /api/chat/`` on a running server, logging every
+simulated student in first. Start a stub and point the server at it:
+
+    python -m scripts.fake_ollama --port 11435 --token-delay 0.03
+    OLLAMA_BASE_URLS=http://localhost:11435 uvicorn app.main:app --port 8000
+    python -m scripts.load_test_chat --mode http --url http://localhost:8000 --users 20 --create-users
+
+The chat endpoint is rate limited to 5 turns per student per minute; keep
+``--think-time`` above ~12 seconds in http mode or the report fills up with 429s.
+
+Save a run with ``--output`` and compare a later one against it with
+``--baseline`` to see what a pooling, caching or queueing change bought.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+PROMPTS = [
+    "What should I take next semester?",
+    "Can I take CMPS 390 before finishing CMPS 280?",
+    "How many credit hours do I still need to graduate?",
+    "Which math courses are required for the computer science degree?",
+    "Is it a good idea to take four CMPS courses in one semester?",
+    "What electives would help me get into machine learning?",
+    "Do I need MATH 200 before MATH 224?",
+    "How do I plan for an internship in the summer?",
+]
+
+SYSTEM_PROMPT = (
+    "You are an academic advisor AI for Southeastern Louisiana University (SELU) Computer Science department. "
+    "You are helping {name} with academic planning and course guidance. "
+    "Be helpful, encouraging, and professional. Keep responses concise but helpful.\n\n"
+    + "Student record: completed CMPS 161, CMPS 257, MATH 200; in progress CMPS 280, MATH 224. " * 8
+)
+
+
+class TurnResult:
+    __slots__ = ("ok", "error", "ttft", "duration", "chunks", "characters")
+
+    def __init__(self):
+        self.ok = False
+        self.error: Optional[str] = None
+        self.ttft: Optional[float] = None
+        self.duration = 0.0
+        self.chunks = 0
+        self.characters = 0
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; ``None`` for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def parse_turns(value: str) -> Tuple[int, int]:
+    low, _, high = value.partition(":")
+    low_turns = int(low)
+    high_turns = int(high) if high else low_turns
+    if low_turns < 1 or high_turns < low_turns:
+        raise argparse.ArgumentTypeError("expected N or MIN:MAX with 1 <= MIN <= MAX")
+    return low_turns, high_turns
+
+
+def summarize(results: List[TurnResult], wall_time: float) -> Dict[str, Any]:
+    ok = [r for r in results if r.ok]
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    durations = [r.duration for r in ok]
+    chunks = sum(r.chunks for r in ok)
+
+    def latency(values: List[float]) -> Dict[str, Optional[float]]:
+        return {
+            "mean": sum(values) / len(values) if values else None,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values) if values else None,
+        }
+
+    return {
+        "turns": len(results),
+        "completed": len(ok),
+        "errors": dict(Counter(r.error for r in results if not r.ok)),
+        "wall_time": wall_time,
+        "replies_per_second": len(ok) / wall_time if wall_time else 0.0,
+        "chunks_per_second": chunks / wall_time if wall_time else 0.0,
+        "ttft": latency(ttfts),
+        "end_to_end": latency(durations),
+    }
+
+
+def _fmt(value: Optional[float], unit: str = "s") -> str:
+    if value is None:
+        return "-"
+    return f"{value * 1000:.0f}ms" if unit == "s" and value < 1 else f"{value:.2f}{unit}"
+
+
+def _delta(value: Optional[float], base: Optional[float]) -> str:
+    if value is None or not base:
+        return ""
+    return f" ({(value - base) / base * 100:+.1f}%)"
+
+
+def print_report(summary: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    base = baseline or {}
+    print(f"\nTurns: {summary['completed']}/{summary['turns']} completed in {summary['wall_time']:.1f}s")
+    if summary["errors"]:
+        print("Errors: " + ", ".join(f"{name} x{count}" for name, count in summary["errors"].items()))
+    print(
+        f"Throughput: {summary['replies_per_second']:.2f} replies/s"
+        f"{_delta(summary['replies_per_second'], base.get('replies_per_second'))}, "
+        f"{summary['chunks_per_second']:.1f} tokens/s"
+        f"{_delta(summary['chunks_per_second'], base.get('chunks_per_second'))}"
+    )
+    for name, label in (("ttft", "Time to first token"), ("end_to_end", "End-to-end latency")):
+        stats = summary[name]
+        base_stats = base.get(name, {})
+        print(f"{label}:")
+        for key in ("mean", "p50", "p95", "p99", "max"):
+            print(f"  {key:<5} {_fmt(stats[key]):>9}{_delta(stats[key], base_stats.get(key))}")
+
+
+def user_rng(args, user_id: int) -> random.Random:
+    """Each student draws from its own generator so ``--seed`` fixes every session's shape."""
+    return random.Random(None if args.seed is None else args.seed * 100003 + user_id)
+
+
+async def think(args, rng: random.Random) -> None:
+    if args.think_time > 0:
+        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+# ----------------------------------------------------------------- service mode
+
+async def start_stubs(args) -> Tuple[List[str], List[Tuple[Any, asyncio.Task]]]:
+    import uvicorn
+    from scripts.fake_ollama import create_app
+
+    urls, servers = [], []
+    for i in range(args.backends):
+        port = args.stub_port + i
+        app = create_app(
+            tokens=args.tokens, token_delay=args.token_delay,
+            first_token_delay=args.first_token_delay, fail_rate=args.fail_rate,
+        )
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        servers.append((server, asyncio.create_task(server.serve())))
+        urls.append(f"http://127.0.0.1:{port}")
+    while not all(server.started for server, _ in servers):
+        if any(task.done() for _, task in servers):
+            raise SystemExit(f"Could not start the stub servers on ports {args.stub_port}-{args.stub_port + args.backends - 1}")
+        await asyncio.sleep(0.05)
+    return urls, servers
+
+
+async def stop_stubs(servers) -> None:
+    for server, _ in servers:
+        server.should_exit = True
+    await asyncio.gather(*(task for _, task in servers))
+
+
+async def service_turn(service, user_id: int, session_id: str, messages: List[Dict[str, str]]) -> TurnResult:
+    from app.core.admission import AdmissionRejected
+
+    result = TurnResult()
+    started = time.perf_counter()
+    try:
+        ticket = service.admission.enqueue(user_id)
+    except AdmissionRejected as e:
+        result.error = f"rejected {e.status_code}"
+        return result
+    reply = []
+    try:
+        async for _ in service.admission.wait(ticket):
+            pass
+        async for chunk in service.chat_stream(messages=messages, affinity_key=session_id):
+            if chunk.startswith("ERROR:"):
+                result.error = chunk[len("ERROR:"):].strip().split(":")[0]
+                break
+            if result.ttft is None:
+                result.ttft = time.perf_counter() - started
+            result.chunks += 1
+            reply.append(chunk)
+        else:
+            result.ok = True
+    finally:
+        service.admission.release(ticket)
+    result.duration = time.perf_counter() - started
+    result.characters = sum(len(c) for c in reply)
+    messages.append({"role": "ai", "content": "".join(reply)})
+    return result
+
+
+async def service_user(service, user_id: int, args, results: List[TurnResult]) -> None:
+    rng = user_rng(args, user_id)
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+    session_id = f"loadtest-{user_id}"
+    messages = [{"role": "system", "content": SYSTEM_PROMPT.format(name=f"Load{user_id}")}]
+    for _ in range(rng.randint(*args.turns)):
+        messages.append({"role": "user", "content": rng.choice(PROMPTS)})
+        results.append(await service_turn(service, user_id, session_id, messages))
+        await think(args, rng)
+
+
+async def run_service(args, results: List[TurnResult]) -> float:
+    servers = []
+    if args.ollama_url:
+        urls = args.ollama_url
+    else:
+        urls, servers = await start_stubs(args)
+        print(f"Stub Ollama backends: {', '.join(urls)}")
+    # Settings are read on import; the service path never opens a database
+    # connection, but the settings model insists on a URL.
+    os.environ["OLLAMA_BASE_URLS"] = ",".join(urls)
+    os.environ.setdefault("DATABASE_URL", "postgresql://loadtest@localhost/unused")
+    from app.services.ai_service import OllamaService
+
+    service = OllamaService()
+    try:
+        await service.probe()
+        started = time.perf_counter()
+        await asyncio.gather(*(service_user(service, i + 1, args, results) for i in range(args.users)))
+        wall_time = time.perf_counter() - started
+        if service.coalesced_requests:
+            print(f"Coalesced requests: {service.coalesced_requests}")
+        return wall_time
+    finally:
+        await service.client.aclose()
+        if servers:
+            await stop_stubs(servers)
+
+
+# -------------------------------------------------------------------- http mode
+
+def create_users(args) -> None:
+    """Create the simulated students that don't exist yet, all with ``--password``."""
+    from app.api.endpoints.user.functions import get_password_hash
+    from app.core.database import SessionLocal
+    from app.models.user import User
+
+    password = get_password_hash(args.password)
+    db = SessionLocal()
+    try:
+        emails = [args.email_template.format(n=i + 1) for i in range(args.users)]
+        existing = {email for (email,) in db.query(User.email).filter(User.email.in_(emails))}
+        for i, email in enumerate(emails):
+            if email not in existing:
+                db.add(User(
+                    w_number=f"W{9000000 + i + 1}", email=email, password=password,
+                    first_name=f"Load{i + 1}", last_name="Test", is_active=True,
+                ))
+        db.commit()
+        print(f"Created {len(emails) - len(existing)} load-test users")
+    finally:
+        db.close()
+
+
+async def login(client: httpx.AsyncClient, args, email: str) -> str:
+    response = await client.post(f"{args.url}/api/auth/login", json={"email": email, "password": args.password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def read_sse(response: httpx.Response) -> AsyncIterator[Tuple[str, str]]:
+    """Yield ``(event, data)`` for each event of a Server-Sent Events response."""
+    event, data = "message", []
+    async for line in response.aiter_lines():
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].removeprefix(" "))
+
+
+async def http_turn(client: httpx.AsyncClient, args, token: str, session_id: Optional[str], prompt: str):
+    result = TurnResult()
+    body: Dict[str, Any] = {"message": prompt}
+    if session_id:
+        body["session_id"] = session_id
+    started = time.perf_counter()
+    try:
+        async with client.stream(
+            "POST", f"{args.url}/api/chat/", json=body, headers={"Authorization": f"Bearer {token}"}
+        ) as response:
+            if response.status_code != 200:
+                result.error = f"http {response.status_code}"
+                await response.aread()
+                return result, session_id
+            async for event, data in read_sse(response):
+                if event == "session":
+                    session_id = json.loads(data)["session_id"]
+                elif event == "message":
+                    if result.ttft is None:
+                        result.ttft = time.perf_counter() - started
+                    result.chunks += 1
+                    result.characters += len(data)
+                elif event == "error":
+                    result.error = "stream error"
+                elif event == "done":
+                    result.ok = result.error is None and json.loads(data).get("complete", False)
+                    if not result.ok and result.error is None:
+                        result.error = "incomplete"
+    except httpx.HTTPError as e:
+        result.error = type(e).__name__
+    result.duration = time.perf_counter() - started
+    return result, session_id
+
+
+async def http_user(client: httpx.AsyncClient, args, user_id: int, token: str, results: List[TurnResult]) -> None:
+    rng = user_rng(args, user_id)
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+    session_id = None
+    for _ in range(rng.randint(*args.turns)):
+        result, session_id = await http_turn(client, args, token, session_id, rng.choice(PROMPTS))
+        results.append(result)
+        await think(args, rng)
+
+
+async def run_http(args, results: List[TurnResult]) -> float:
+    if args.create_users:
+        create_users(args)
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        emails = [args.email_template.format(n=i + 1) for i in range(args.users)]
+        tokens = await asyncio.gather(*(login(client, args, email) for email in emails))
+        print(f"Logged in {len(tokens)} users")
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            http_user(client, args, i + 1, token, results) for i, token in enumerate(tokens)
+        ))
+        return time.perf_counter() - started
+
+
+# ------------------------------------------------------------------------------
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    results: List[TurnResult] = []
+    if args.mode == "service":
+        wall_time = await run_service(args, results)
+    else:
+        wall_time = await run_http(args, results)
+    summary = summarize(results, wall_time)
+    summary["run"] = {
+        "label": args.label,
+        "revision": git_revision(),
+        "mode": args.mode,
+        "users": args.users,
+        "turns": list(args.turns),
+        "think_time": args.think_time,
+        "backends": len(args.ollama_url) if args.ollama_url else args.backends,
+        "tokens": args.tokens,
+        "token_delay": args.token_delay,
+        "first_token_delay": args.first_token_delay,
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("service", "http"), default="service")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated students")
+    parser.add_argument("--turns", type=parse_turns, default=(3, 6), help="turns per session, N or MIN:MAX")
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean pause between turns, seconds")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="spread user start times over this many seconds")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable session shapes")
+    parser.add_argument("--label", default=None, help="name stored with the results")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+
+    stub = parser.add_argument_group("service mode")
+    stub.add_argument("--ollama-url", action="append", help="use running Ollama/stub servers instead of starting stubs")
+    stub.add_argument("--backends", type=int, default=1, help="stub Ollama servers to start")
+    stub.add_argument("--stub-port", type=int, default=11535, help="port of the first stub server")
+    stub.add_argument("--tokens", type=int, default=60, help="content frames per stub answer")
+    stub.add_argument("--token-delay", type=float, default=0.02, help="seconds between stub frames")
+    stub.add_argument("--first-token-delay", type=float, default=0.2, help="simulated prompt evaluation time")
+    stub.add_argument("--fail-rate", type=float, default=0.0, help="fraction of stub calls answered with 500")
+
+    http = parser.add_argument_group("http mode")
+    http.add_argument("--url", default="http://localhost:8000", help="base URL of the running server")
+    http.add_argument("--email-template", default="loadtest{n}@selu.edu")
+    http.add_argument("--password", default="loadtest-password")
+    http.add_argument("--create-users", action="store_true", help="insert missing load-test users first")
+    http.add_argument("--timeout", type=float, default=300.0, help="per-request timeout, seconds")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    summary = asyncio.run(run(args))
+    print_report(summary, baseline)
+    if baseline:
+        print(f"\nCompared with {baseline['run'].get('label') or args.baseline} (revision {baseline['run'].get('revision')})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
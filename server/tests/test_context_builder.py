@@ -0,0 +1,68 @@
+import os
+import uuid
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/test")
+
+from app.services.context_builder import ConversationContextBuilder  # noqa: E402
+
+
+def _pairs(n):
+    history = []
+    for i in range(n):
+        history.append({"role": "user", "content": f"Question {i}."})
+        history.append({"role": "ai", "content": f"Answer {i}."})
+    return history
+
+
+def _summary_lines(messages):
+    summary = next((m["content"] for m in messages if m["content"].startswith("Summary of")), "")
+    return summary.splitlines()[1:]
+
+
+def _verbatim(messages):
+    return [m["content"] for m in messages[1:] if not m["content"].startswith("Summary of")]
+
+
+def test_boundary_moving_back_drops_lines_without_duplicates():
+    builder = ConversationContextBuilder(token_budget=200, summary_token_budget=120)
+    session_id = uuid.uuid4()
+    history = _pairs(6) + [{"role": "user", "content": "ok"}]
+
+    # A large system prompt (e.g. catalog context) folds almost everything.
+    first = builder.build("sys " + "catalog " * 100, history, session_id)
+    assert len(_summary_lines(first)) == 12
+
+    # The next turn has a short prompt, so more history fits verbatim again.
+    history += [{"role": "ai", "content": "ok"}, {"role": "user", "content": "ok"}]
+    second = builder.build("sys", history, session_id)
+
+    lines = _summary_lines(second)
+    recent = _verbatim(second)
+    assert len(lines) == len(set(lines))
+    assert lines == [
+        "- Student asked: Question 0.",
+        "- Advisor answered: Answer 0.",
+        "- Student asked: Question 1.",
+        "- Advisor answered: Answer 1.",
+    ][: len(lines)]
+    assert recent[-3:] == ["ok", "ok", "ok"]
+    for content in recent:
+        assert f"- Student asked: {content}" not in lines
+        assert f"- Advisor answered: {content}" not in lines
+
+
+def test_archived_lines_survive_window_slide():
+    builder = ConversationContextBuilder(token_budget=200, summary_token_budget=400)
+    session_id = uuid.uuid4()
+    history = _pairs(6) + [{"role": "user", "content": "ok"}]
+    builder.build("sys " + "catalog " * 100, history, session_id)
+
+    # The history window drops the two oldest messages.
+    slid = history[2:] + [{"role": "ai", "content": "ok"}, {"role": "user", "content": "ok"}]
+    lines = _summary_lines(builder.build("sys " + "catalog " * 100, slid, session_id))
+
+    assert lines == [
+        line
+        for i in range(6)
+        for line in (f"- Student asked: Question {i}.", f"- Advisor answered: Answer {i}.")
+    ] + ["- Student asked: ok", "- Advisor answered: ok"]